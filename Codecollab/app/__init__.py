@@ -4,9 +4,10 @@ from flask_jwt_extended import JWTManager
 from flask_socketio import SocketIO
 from flask_cors import CORS
 from config import Config
+from app import database
 
-# Initialize the database
-db = SQLAlchemy()
+# Initialize the database; reads can be routed to a replica (see app/database.py)
+db = SQLAlchemy(session_options={"class_": database.RoutingSession})
 jwt = JWTManager()
 socketio = SocketIO(cors_allowed_origins="*")
 
@@ -18,15 +19,31 @@ def create_app(config_class=Config):
     # Enable cors for the flask app
     CORS(app)
     
+    # Logging and sampled tracing for socket handlers
+    from app import tracing
+    tracing.init_app(app)
+
     # Initialize extensions
+    database.configure_engines(app)
     db.init_app(app)
+    database.init_app(app, db)
     jwt.init_app(app)
     socketio.init_app(app)
     
     # Import and register blueprints
     from app.api_routes import bp as api_blueprint
     from app.main_routes import bp as main_blueprint
+    from app.metrics import bp as metrics_blueprint
+    from app.startup import bp as startup_blueprint
+    from app.profiling import bp as profiling_blueprint
     app.register_blueprint(api_blueprint)
     app.register_blueprint(main_blueprint)
+    app.register_blueprint(metrics_blueprint)
+    app.register_blueprint(startup_blueprint)
+    app.register_blueprint(profiling_blueprint)
+
+    # Instrumentation is only hooked in when METRICS_ENABLED is set
+    from app import metrics
+    metrics.install(app, socketio, db)
     
     return app
\ No newline at end of file
@@ -1,11 +1,26 @@
 import uuid
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app import db, socketio
 from app.models import User, Room, Problem, TestCase, SessionEvent, UserPresence
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, decode_token
 from flask_socketio import join_room, leave_room, emit
-from app.code_executor import run_code
-from datetime import timedelta
+from app.code_executor import run_code, stream_code
+from app.presence_reaper import reaper_metrics
+from app.room_lifecycle import hibernation_metrics, touch_room
+from app.session_archive import load_session_events, event_started_at, SUMMARY_EVENT_TYPE
+from app import metrics
+from app.metrics import track_event
+from app import tracing
+from app.tracing import logger
+from app import wire
+from app.documents import get_document, document_text, save_document, set_document_text
+from app.catalog import get_problem_details, get_problem_list
+from app.database import read_replica
+from app.blob_store import blob_path, iter_blob
+from app.checkers import get_checker
+from app.problem_import import import_package, PackageError
+from app.auth import admin_required
+from datetime import datetime, timedelta, timezone
 
 # Create a Blueprint for API routes
 bp = Blueprint('api', __name__, url_prefix='/api')
@@ -14,15 +29,20 @@ bp = Blueprint('api', __name__, url_prefix='/api')
 # Format: {room_id: [{'username': 'user1', 'socket_id': 'sid1'}, ...]}
 active_users = {}
 
-def record_event(room_id, event_type, payload=None):
+# Maps each socket id to the room/user it joined, so disconnects can be cleaned up
+# Format: {sid: {'room_id': 'abc123', 'username': 'user1'}}
+socket_sessions = {}
+
+def record_event(room_id, event_type, payload=None, commit=True):
     event = SessionEvent()
     event.room_id = str(room_id)
     event.event_type = event_type
     event.payload = payload or {}
     db.session.add(event)
-    db.session.commit()
+    if commit:
+        db.session.commit()
     
-def upsert_presence(room_id, username, updates):
+def upsert_presence(room_id, username, updates, commit=True):
     presence = UserPresence.query.filter_by(room_id=room_id, username=username).first()
     if not presence:
         presence = UserPresence()
@@ -32,9 +52,17 @@ def upsert_presence(room_id, username, updates):
         db.session.add(presence)
     for key, value in updates.items():
         setattr(presence, key, value)
-    db.session.commit()
+    presence.last_seen = datetime.now(timezone.utc)
+    if commit:
+        db.session.commit()
     return presence
 
+def remove_presence(room_id, username):
+    p = UserPresence.query.filter_by(room_id=room_id, username=username).first()
+    if p:
+        db.session.delete(p)
+        db.session.commit()
+
 def presence_to_dict(p):
     return {
         "username": p.username,
@@ -48,10 +76,20 @@ def presence_to_dict(p):
         "last_seen": p.last_seen.isoformat() if p.last_seen else None,
     }
 
-def broadcast_room_presence(room_id):
-    presences = UserPresence.query.filter_by(room_id=room_id).all()
+def broadcast_room_presence(room_id, presences=None):
+    if presences is None:
+        presences = UserPresence.query.filter_by(room_id=room_id).all()
     payload = [presence_to_dict(p) for p in presences]
-    emit('presence_snapshot', {"room_id": room_id, "users": payload}, to=room_id)    
+    wire.broadcast('presence_snapshot', {"room_id": room_id, "users": payload}, room_id)
+
+def track_socket(room_id, username):
+    socket_sessions[request.sid] = {'room_id': room_id, 'username': username}
+
+def untrack_socket():
+    return socket_sessions.pop(request.sid, None)
+
+def has_other_sockets(room_id, username):
+    return any(s['room_id'] == room_id and s['username'] == username for s in socket_sessions.values())
 # ... (Authentication and other routes remain the same) ...
 def generate_room_id():
     return str(uuid.uuid4().hex)[:8]
@@ -150,28 +188,37 @@ def get_room(room_id):
     room = Room.query.get(room_id)
     if not room:
         return jsonify({"error": "Room not found"}), 404
-    problem_details = {}
-    if room.problem_id:
-        problem = Problem.query.get(room.problem_id)
-        if problem:
-            problem_details = {
-                "title": problem.title,
-                "description": problem.description,
-                "template_code": problem.template_code
-            }
     return jsonify({
         "id": room.id,
-        "code_content": room.code_content,
+        "code_content": document_text(room),
+        "revision": room.revision,
         "created_by": room.created_by,
         "language": room.language,
-        "problem": problem_details
+        "problem": get_problem_details(room.problem_id) or {}
     }), 200
 
 @bp.route('/problems', methods=['GET'])
+@read_replica()
 def get_problems():
-    problems = Problem.query.all()
-    problem_list = [{"id": p.id, "title": p.title} for p in problems]
-    return jsonify(problem_list), 200
+    return jsonify(get_problem_list()), 200
+
+@bp.route('/problems/import', methods=['POST'])
+@admin_required
+def import_problems():
+    """
+    Imports a problem package (see app/problem_import.py), sent either as the raw
+    request body or as a multipart 'package' file. The archive is read as a stream.
+    Admins only; uploads over IMPORT_MAX_BYTES are rejected with 413.
+    """
+    request.max_content_length = current_app.config.get('IMPORT_MAX_BYTES', 512 * 1024 * 1024)
+    upload = request.files.get('package')
+    stream = upload.stream if upload else request.stream
+    try:
+        stats = import_package(stream)
+    except PackageError as e:
+        return jsonify({"error": str(e)}), 400
+    logger.info("User %s imported a problem package: %s", get_jwt_identity(), stats)
+    return jsonify({"message": "Problems imported", **stats}), 201
 
 @bp.route('/test-socket', methods=['POST'])
 def test_socket():
@@ -181,24 +228,16 @@ def test_socket():
     message = data.get('message', 'Hello from test endpoint')
     
     # Try to emit to the room
-    print(f"[test-socket] Testing emit to room {room_id}")
+    logger.info("test-socket emit to room=%s", room_id)
     socketio.emit('code_update', {'code_content': message}, to=room_id)
-    print(f"[test-socket] Emit completed")
     
     return jsonify({"status": "test message sent", "room_id": room_id}), 200
 
 @bp.route('/sessions/<string:room_id>/timeline', methods=['GET'])
+@read_replica()
 def get_session_timeline(room_id):
-    events = db.session.query(SessionEvent).filter_by(room_id=room_id).order_by(SessionEvent.created_at).all()
-    
-    timeline = []
-    for event in events:
-        timeline.append({
-            'id': event.id,
-            'event_type': event.event_type,
-            'payload': event.payload,
-            'created_at': event.created_at.isoformat() if event.created_at else None
-        })
+    # Includes events that were moved to the compressed archive
+    timeline = load_session_events(room_id)
         
     return jsonify({
         'room_id': room_id,
@@ -207,65 +246,106 @@ def get_session_timeline(room_id):
     }), 200
     
 @bp.route('/sessions/<room_id>/summary', methods=["GET"])
+@read_replica()
 def get_session_summary(room_id):
-    events = db.session.query(SessionEvent).filter_by(room_id=room_id).all()
+    events = load_session_events(room_id)
     
     event_counts = {}
     for event in events:
-        event_counts[event.event_type] = event_counts.get(event.event_type, 0) + 1
+        event_type = event['event_type']
+        count = 1
+        # Compacted runs still count as the code_change events they replaced
+        if event_type == SUMMARY_EVENT_TYPE:
+            event_type = "code_change"
+            count = (event['payload'] or {}).get("collapsed", 1)
+        event_counts[event_type] = event_counts.get(event_type, 0) + count
         
-    first_event = db.session.query(SessionEvent).filter_by(room_id=room_id).order_by(SessionEvent.created_at).first()
-    last_event = db.session.query(SessionEvent).filter_by(room_id=room_id).order_by(SessionEvent.created_at.desc()).first()
+    first_event = events[0] if events else None
+    last_event = events[-1] if events else None
     
     return jsonify({
         'room_id': room_id,
-        'total_events': len(events),
+        'total_events': sum(event_counts.values()),
         'event_counts': event_counts,
-        'session_start': first_event.created_at.isoformat() if first_event else None,
-        'session_end': last_event.created_at.isoformat() if last_event else None,
+        'session_start': event_started_at(first_event) if first_event else None,
+        'session_end': last_event['created_at'] if last_event else None,
         'duration_minutes': None
     }), 200
 
 ## --- WebSocket Event Handlers ---
 @socketio.on('connect')
 def handle_connect():
-    print(f"Client connected")
+    tracing.span('connect', sid=request.sid).log("client connected")
+    if metrics.enabled:
+        metrics.socket_connections.inc()
     emit('connected', {'message': 'Connected to server'})
 
+@socketio.on('disconnect')
+@track_event('disconnect')
+def handle_disconnect(*args):
+    """Cleans up presence for sockets that vanish without sending leave_room (crashed tabs, network drops)."""
+    if metrics.enabled:
+        metrics.socket_connections.dec()
+    wire.forget(request.sid)
+    session = untrack_socket()
+    if not session:
+        return
+    room_id = session['room_id']
+    username = session['username']
+    tracing.current_span().annotate(room=room_id, user=username)
+    # Another tab of the same user is still connected, keep the presence row
+    if has_other_sockets(room_id, username):
+        return
+    if room_id in active_users:
+        active_users[room_id] = [user for user in active_users[room_id] if user['username'] != username]
+    remove_presence(room_id, username)
+    record_event(room_id, "disconnect", {"username": username})
+    emit('user_left', {'username': username}, to=room_id)
+    broadcast_room_presence(room_id)
+
 @socketio.on('test_message')
+@track_event('test_message')
 def handle_test_message(data):
     """Simple test event to verify socket communication"""
     room_id = data.get('room_id', 'test')
     message = data.get('message', 'Test message')
-    print(f"[test_message] Received test message: {message} for room: {room_id}")
+    logger.info("test_message received for room=%s", room_id)
     
     # Echo back to the same client
     emit('test_response', {'message': f'Echo: {message}', 'room_id': room_id})
     
     # Also try to broadcast to the room
     emit('code_update', {'code_content': f'Test broadcast: {message}'}, to=room_id)
-    print(f"[test_message] Sent test broadcast to room {room_id}")
 
 @socketio.on('join_room')
+@track_event('join_room')
 def handle_join_room(data):
     room_id = data.get('room_id')
     username = data.get('username', 'A user')
-    print(f"User {username} joining room {room_id}")
-    
-    # DEBUG: Check current rooms before joining
-    from flask_socketio import rooms
-    before_rooms = rooms()
-    print(f"[join_room] Before joining: {username} is in rooms: {before_rooms}")
-    
+    span = tracing.current_span()
     join_room(room_id)
-    upsert_presence(room_id, username, {})
-    broadcast_room_presence(room_id)
-    record_event(room_id, "join", {"username": username})
-    print(f"User {username} joined socket room {room_id}")
+    track_socket(room_id, username)
+    # Clients that advertise binary/compression support get packed large payloads
+    wire_format = wire.negotiate(request.sid, data.get('wire'))
+    if wire_format:
+        join_room(wire.format_room(room_id, wire_format))
+        emit('wire_format', {'format': wire_format})
+    # Presence and the join event are written in one transaction
+    upsert_presence(room_id, username, {}, commit=False)
+    record_event(room_id, "join", {"username": username}, commit=False)
+    touch_room(room_id)
+    db.session.commit()
+    presences = UserPresence.query.filter_by(room_id=room_id).all()
+    broadcast_room_presence(room_id, presences)
+
+    # Clients that ask for it get everything needed to render the room in one payload
+    if data.get('bootstrap'):
+        wire.send('room_bootstrap', build_room_bootstrap(room_id, presences), request.sid)
     
-    # DEBUG: Check current rooms after joining
-    after_rooms = rooms()
-    print(f"[join_room] After joining: {username} is in rooms: {after_rooms}")
+    # Debug-only: socket rooms lookup is skipped unless this span is traced
+    if span.enabled:
+        from flask_socketio import rooms
+        span.log("joined socket room", rooms=rooms())
     
     # Track the user in the active_users dictionary
     if room_id not in active_users:
@@ -274,13 +354,28 @@ def handle_join_room(data):
     # Add user if not already in the room
     if username not in [user['username'] for user in active_users[room_id]]:
         active_users[room_id].append({'username': username})
-        print(f"Added {username} to room {room_id}. Active users: {[u['username'] for u in active_users[room_id]]}")
+        if span.enabled:
+            span.log("added active user", active=len(active_users[room_id]))
     
     # Broadcast to other users in the room
     emit('user_joined', {'username': username}, to=room_id, include_self=False)
-    print(f"Emitted user_joined event for {username} to room {room_id}")
+
+def build_room_bootstrap(room_id, presences):
+    """Document, revision, language, problem, catalog and roster for a joining client."""
+    room = Room.query.get(room_id)
+    return {
+        "room_id": room_id,
+        "exists": room is not None,
+        "code_content": document_text(room) if room else None,
+        "revision": room.revision if room else 0,
+        "language": room.language if room else 'python',
+        "problem": (get_problem_details(room.problem_id) if room else None) or {},
+        "problems": get_problem_list(),
+        "users": [presence_to_dict(p) for p in presences],
+    }
 
 @socketio.on('request_existing_users')
+@track_event('request_existing_users')
 def handle_request_existing_users(data):
     room_id = data.get('room_id')
     presences = UserPresence.query.filter_by(room_id=room_id).all()
@@ -288,91 +383,135 @@ def handle_request_existing_users(data):
     emit('existing_users', {'users': users_in_room})
 
 @socketio.on('code_change')
+@track_event('code_change')
 def handle_code_change(data):
     room_id = data.get('room_id')
     # Handle both parameter names for compatibility
     new_code = data.get('code_content') or data.get('code')
     message_id = data.get('message_id')  # Get the message ID from the client
-    print(f"[code_change] Received for room_id: {room_id}, code_content: {new_code[:30] if new_code else 'None'}..., message_id: {message_id}")
     
     if not new_code:
-        print(f"[code_change] No code content received!")
+        logger.warning("code_change without code content for room=%s", room_id)
         return
     
-    # DEBUG: Check if anyone is actually in this room
-    from flask_socketio import rooms
-    current_rooms = rooms()
-    print(f"[code_change] Current socket rooms: {current_rooms}")
-    print(f"[code_change] Requesting client is in rooms: {current_rooms}")
+    span = tracing.current_span()
+    span.annotate(message_id=message_id, length=len(new_code))
+    # Debug-only: socket rooms lookup is skipped unless this span is traced
+    if span.enabled:
+        from flask_socketio import rooms
+        span.log("received", rooms=rooms())
     
     # First try to get the room from database
     room = Room.query.get(room_id)
     if room:
-        print(f"[code_change] Room found: {room_id}, updating code.")
-        room.code_content = new_code
+        # Only the changed span of the document (and its chunks) is rewritten
+        set_document_text(room, new_code)
+        record_event(room_id, "code_change", {"message_id": message_id, "length": len(new_code or "")}, commit=False)
         db.session.commit()
-        record_event(room_id, "code_change", {"message_id": message_id, "length": len(new_code or "")})
         # Broadcast to ALL users in the room (including sender for perfect sync)
-        print(f"[code_change] Emitting code_update to room {room_id} with content: {new_code[:30]}...")
-        emit('code_update', {'code_content': new_code, 'message_id': message_id}, to=room_id, include_self=False)
-        print(f"[code_change] Emit completed for room {room_id}")
+        wire.broadcast('code_update', {'code_content': new_code, 'message_id': message_id, 'revision': room.revision}, room_id, skip_sid=request.sid)
     else:
-        print(f"[code_change] Room NOT found: {room_id}, creating it...")
+        span.log("room not found, creating it")
         # Create the room if it doesn't exist
         try:
             new_room = Room()
             new_room.id = room_id
             new_room.created_by = None
-            new_room.code_content = new_code
             db.session.add(new_room)
-            record_event(room_id, "code_change", {"message_id": message_id, "length": len(new_code or "")})
+            db.session.flush()
+            set_document_text(new_room, new_code)
+            record_event(room_id, "code_change", {"message_id": message_id, "length": len(new_code or "")}, commit=False)
             db.session.commit()
-            print(f"[code_change] Created new room: {room_id}")
             # Broadcast to ALL users in the room
-            print(f"[code_change] Emitting code_update to room {room_id} with content: {new_code[:30]}...")
-            emit('code_update', {'code_content': new_code, 'message_id': message_id}, to=room_id, include_self=False)
-            print(f"[code_change] Emit completed for room {room_id}")
+            wire.broadcast('code_update', {'code_content': new_code, 'message_id': message_id, 'revision': new_room.revision}, room_id, skip_sid=request.sid)
         except Exception as e:
-            print(f"[code_change] Error creating room: {e}")
+            db.session.rollback()
+            logger.warning("code_change could not create room=%s: %s", room_id, e)
             # Still broadcast the update even if room creation fails
             record_event(room_id, "code_change", {"message_id": message_id, "length": len(new_code or "")})
-            print(f"[code_change] Emitting code_update to room {room_id} (fallback) with content: {new_code[:30]}...")
-            emit('code_update', {'code_content': new_code, 'message_id': message_id}, to=room_id, include_self=False)
-            print(f"[code_change] Emit completed for room {room_id} (fallback)")
+            wire.broadcast('code_update', {'code_content': new_code, 'message_id': message_id}, room_id, skip_sid=request.sid)
+
+def _edit_position(position, default=None):
+    """Validates a client {line, column} position. Returns (line, column) ints, or None."""
+    if not isinstance(position, dict):
+        return None
+    line = position.get('line', default[0] if default else None)
+    column = position.get('column', default[1] if default else None)
+    # bool is an int subclass, but true/false is never a valid position
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in (line, column)):
+        return None
+    return line, column
+
+@socketio.on('code_edit')
+@track_event('code_edit')
+def handle_code_edit(data):
+    """
+    Applies an incremental edit: replaces the range start..end (1-based line/column,
+    as sent by the editor) with text, without resending the whole document.
+    Malformed edits are dropped.
+    """
+    room_id = data.get('room_id')
+    start = _edit_position(data.get('start'))
+    end = _edit_position(data.get('end') or {}, start) if start else None
+    text = data.get('text') or ""
+    message_id = data.get('message_id')
+    if not start or not end or not isinstance(text, str):
+        logger.warning("code_edit with an invalid range or text for room=%s", room_id)
+        return
+    room = Room.query.get(room_id)
+    if not room:
+        return
+    doc = get_document(room)
+    start_offset = doc.position_to_offset(*start)
+    end_offset = doc.position_to_offset(*end)
+    if end_offset < start_offset:
+        start_offset, end_offset = end_offset, start_offset
+    doc.replace(start_offset, end_offset, text)
+    save_document(room, doc)
+    record_event(room_id, "code_edit", {"message_id": message_id, "length": len(doc)}, commit=False)
+    db.session.commit()
+    emit('code_edit', {
+        'start': {'line': start[0], 'column': start[1], 'offset': start_offset},
+        'end': {'line': end[0], 'column': end[1], 'offset': end_offset},
+        'text': text,
+        'message_id': message_id,
+        'revision': room.revision,
+    }, to=room_id, include_self=False)
 
 @socketio.on('leave_room')
+@track_event('leave_room')
 def handle_leave_room(data):
     room_id = data.get('room_id')
     username = data.get('username')
-    print(f"User {username} leaving room {room_id}")
-    
+    span = tracing.current_span()
     # Leave the socket room
     leave_room(room_id)
-    
+    wire_format = wire.client_formats.pop(request.sid, None)
+    if wire_format:
+        leave_room(wire.format_room(room_id, wire_format))
+    untrack_socket()
+
     # Remove user from active_users tracking
     if room_id in active_users:
         active_users[room_id] = [user for user in active_users[room_id] if user['username'] != username]
-        print(f"Removed {username} from room {room_id}. Remaining users: {[u['username'] for u in active_users[room_id]]}")
+        span.log("removed active user", remaining=len(active_users[room_id]))
     record_event(room_id, "leave", {"username": username})
-    
+
     # Emit user_left event to remaining users
-    print(f"Emitting user_left event for {username} to room {room_id}")  # Debug log
     emit('user_left', {'username': username}, to=room_id)
-    
-    p = UserPresence.query.filter_by(room_id=room_id, username=username).first()
-    if p:
-        db.session.delete(p)
-        db.session.commit()
+
+    remove_presence(room_id, username)
     broadcast_room_presence(room_id)
-    
+
     # Also emit lobby_activated if needed
     room = Room.query.get(room_id)
     if room:
         room.problem_id = None
         db.session.commit()
         emit('lobby_activated', {}, to=room_id)
-        
+    
 @socketio.on('language_change')
+@track_event('language_change')
 def handle_language_change(data):
     room_id = data.get('room_id')
     new_language = data.get('language')
@@ -386,38 +525,35 @@ def handle_language_change(data):
 
 # --- NEW: WebSocket Handler for Loading a Problem ---
 @socketio.on('load_problem')
+@track_event('load_problem')
 def handle_load_problem(data):
     """Handles a request to load a problem into a room."""
     room_id = data.get('room_id')
     problem_id = data.get('problem_id')
 
     room = Room.query.get(room_id)
-    problem = Problem.query.get(problem_id)
+    problem_details = get_problem_details(problem_id)
 
-    if room and problem:
+    if room and problem_details:
         # Link the problem to the room and save to DB
-        room.problem_id = problem.id
-        room.code_content = problem.template_code # Reset code to template
+        room.problem_id = problem_id
+        doc = set_document_text(room, problem_details["template_code"]) # Reset code to template
+        record_event(room_id, "load_problem", {"problem_id": problem_id}, commit=False)
         db.session.commit()
-        record_event(room_id, "load_problem", {"problem_id": problem_id})
 
-        # Fetch the full room data to send back
-        problem_details = {
-            "title": problem.title,
-            "description": problem.description,
-            "template_code": problem.template_code
-        }
         room_data = {
             "id": room.id,
-            "code_content": room.code_content,
+            "code_content": doc.text(),
+            "revision": room.revision,
             "language": room.language,
             "problem": problem_details
         }
         
         # Broadcast to everyone in the room that the problem is loaded
-        emit('problem_loaded', room_data, to=room_id)
+        wire.broadcast('problem_loaded', room_data, room_id)
 
 @socketio.on('execute_code')
+@track_event('execute_code')
 def handle_execute_code(data):
     """Handles a request to execute code (Run button)."""
     room_id = data.get('room_id')
@@ -437,6 +573,7 @@ def handle_execute_code(data):
     record_event(room_id, "run", {"language": language, "has_error": bool(error)})
 
 @socketio.on('submit_code')
+@track_event('submit_code')
 def handle_submit_code(data):
     """
     Handles a code submission, runs it against all test cases,
@@ -452,47 +589,71 @@ def handle_submit_code(data):
         emit('submit_result', {'verdict': 'Error', 'details': 'No problem associated with this room.'}, to=room_id)
         return
 
-    problem = Problem.query.get(room.problem_id)
-    if not problem or not problem.test_cases:
+    problem = db.session.get(Problem, room.problem_id)
+    checker = get_checker(problem.checker) if problem else None
+    if checker is None:
+        emit('submit_result', {'verdict': 'Error', 'details': 'This problem cannot be judged right now.'}, to=room_id)
+        return
+
+    # Imported suites can be large: only the inline columns are loaded here, blob-backed
+    # inputs are streamed into the sandbox and output is checked while it is produced
+    test_cases = TestCase.query.filter_by(problem_id=room.problem_id).order_by(TestCase.id).all()
+    if not test_cases:
         emit('submit_result', {'verdict': 'Error', 'details': 'Could not find test cases for this problem.'}, to=room_id)
         return
 
     verdict = "Accepted"
     details = ""
     passed_all_tests = True
-    for i, test_case in enumerate(problem.test_cases):
-        actual_output, error = run_code(user_code, language, test_case.input_data)
-        # Sanitize output: only compare the last non-empty line
-        if actual_output:
-            lines = [line for line in actual_output.splitlines() if line.strip()]
-            if lines:
-                actual_output = lines[-1]
+    for i, test_case in enumerate(test_cases):
+        if test_case.input_blob:
+            run_input = {'input_path': blob_path(test_case.input_blob)}
+        else:
+            run_input = {'test_input_args': test_case.input_data}
+        if test_case.output_blob:
+            expected_chunks = iter_blob(test_case.output_blob)
+        else:
+            expected_chunks = iter([test_case.expected_output.encode('utf-8')])
+        with stream_code(user_code, language, **run_input) as execution:
+            passed, message = checker(expected_chunks, execution.stdout(), problem.checker_options or {})
+            error = execution.finish()
         if error:
             verdict = "Runtime Error"
             details = f"Test Case #{i+1} failed with an error:\n{error}"
             passed_all_tests = False
             break
-        if actual_output.strip() != test_case.expected_output.strip():
+        if not passed:
             verdict = "Wrong Answer"
-            details = f"Test Case #{i+1} failed.\nExpected: {test_case.expected_output}\nGot: {actual_output}"
+            details = f"Test Case #{i+1} failed.\n{message}"
             passed_all_tests = False
             break
     if passed_all_tests:
         verdict = "Accepted"
-        details = f"Congratulations! You passed all {len(problem.test_cases)} test cases."
+        details = f"Congratulations! You passed all {len(test_cases)} test cases."
     record_event(room_id, "submit", {"verdict": verdict})
     emit('submit_result', {'verdict': verdict, 'details': details}, to=room_id)
         
 @socketio.on('presence_init')
+@track_event('presence_init')
 def handle_presence_init(data):
     room_id = data.get('room_id')
     username = data.get('username')
     if not room_id or not username:
         return
+    track_socket(room_id, username)
     upsert_presence(room_id, username, {})
     broadcast_room_presence(room_id)
+
+@socketio.on('presence_heartbeat')
+@track_event('presence_heartbeat')
+def handle_presence_heartbeat(data):
+    room_id = data.get('room_id')
+    username = data.get('username')
+    if room_id and username:
+        upsert_presence(room_id, username, {})
     
 @socketio.on('cursor_move')
+@track_event('cursor_move')
 def handle_cursor_move(data):
     room_id = data.get('room_id')
     username = data.get('username')
@@ -503,6 +664,7 @@ def handle_cursor_move(data):
         emit('presence_cursor', {"username": username, "cursor": {"line": int(line), "column": int(column)}}, to=room_id, include_self=False)
         
 @socketio.on('selection_change')
+@track_event('selection_change')
 def handle_selection_change(data):
     room_id = data.get('room_id')
     username = data.get('username')
@@ -519,6 +681,7 @@ def handle_selection_change(data):
         emit('presence_selection', {"username": username, "start": s, "end": e}, to=room_id, include_self=False)
         
 @socketio.on('typing')
+@track_event('typing')
 def handle_typing(data):
     room_id = data.get('room_id')
     username = data.get('username')
@@ -528,18 +691,27 @@ def handle_typing(data):
         emit('presence_typing', {"username": username, "is_typing": is_typing}, to=room_id, include_self=False)
         
 @socketio.on('presence_leave')
+@track_event('presence_leave')
 def handle_presence_leave(data):
     room_id = data.get('room_id')
     username = data.get('username')
     if not room_id or not username:
         return
-    p = UserPresence.query.filter_by(room_id=room_id, username=username).first()
-    if p:
-        db.session.delete(p)
-        db.session.commit()
+    untrack_socket()
+    remove_presence(room_id, username)
     broadcast_room_presence(room_id)
 
 @bp.route('/rooms/<string:room_id>/presence', methods=['GET'])
+@read_replica()
 def get_room_presence(room_id):
     presences = UserPresence.query.filter_by(room_id=room_id).all()
-    return jsonify([presence_to_dict(p) for p in presences]), 200
\ No newline at end of file
+    return jsonify([presence_to_dict(p) for p in presences]), 200
+
+@bp.route('/presence/reaper', methods=['GET'])
+def get_presence_reaper_metrics():
+    return jsonify({**reaper_metrics, "tracked_sockets": len(socket_sessions)}), 200
+
+@bp.route('/rooms/lifecycle', methods=['GET'])
+def get_room_lifecycle_metrics():
+    hot_rooms = Room.query.filter(Room.hibernated.is_(False)).count()
+    return jsonify({**hibernation_metrics, "hot_rooms": hot_rooms, "active_rooms": len(active_users)}), 200
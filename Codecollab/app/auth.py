@@ -0,0 +1,29 @@
+from functools import wraps
+from flask import current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+def admin_ids():
+    """User ids listed in ADMIN_USER_IDS. Ids, not usernames: with open registration a
+    username can be claimed by whoever registers it first."""
+    ids = set()
+    for value in current_app.config.get('ADMIN_USER_IDS', '').split(','):
+        value = value.strip()
+        if value.isdigit():
+            ids.add(int(value))
+    return ids
+
+def admin_required(f):
+    """Allows only logged-in users whose id is listed in ADMIN_USER_IDS."""
+    @wraps(f)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        from app.models import User
+        from app import db
+        try:
+            user = db.session.get(User, int(get_jwt_identity()))
+        except (TypeError, ValueError):
+            user = None
+        if not user or user.id not in admin_ids():
+            return jsonify({"error": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import tempfile
+from flask import current_app
+
+# Large test data lives on disk, addressed by the sha256 of its content, so identical
+# inputs/outputs are stored once no matter how many problems or imports reference them
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def _blob_dir():
+    path = current_app.config.get('BLOB_STORE_DIR') or os.path.join(current_app.instance_path, 'blobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def blob_path(digest):
+    # Digests come from the database, but never let one escape the blob directory
+    if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+        raise ValueError(f"Invalid blob digest: {digest!r}")
+    return os.path.join(_blob_dir(), digest[:2], digest)
+
+def has_blob(digest):
+    return os.path.exists(blob_path(digest))
+
+def put_stream(stream):
+    """
+    Copies a binary stream into the store chunk by chunk and returns (digest, size,
+    created). Content that is already stored is not written again.
+    """
+    directory = _blob_dir()
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.incoming-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        digest = sha.hexdigest()
+        path = blob_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return digest, size, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return digest, size, True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def remove_blob(digest):
+    """Deletes a blob if it exists. Callers make sure nothing references it anymore."""
+    try:
+        os.remove(blob_path(digest))
+    except FileNotFoundError:
+        pass
+
+def open_blob(digest):
+    return open(blob_path(digest), 'rb')
+
+def iter_blob(digest, chunk_size=COPY_CHUNK_SIZE):
+    with open_blob(digest) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,76 @@
+import time
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models import Problem
+
+# Problems change only when seeded or imported, so their details are cached in memory
+# Format: {problem_id: {"title": ..., "description": ..., "template_code": ...}}
+_problem_details = {}
+_problem_list = None
+
+# Seeds, CLI imports and other workers write problems behind this process's back, so the
+# cache is compared against a cheap summary of the table at most every CATALOG_CHECK_INTERVAL
+# Format: (problem count, max id, max updated_at)
+_fingerprint = None
+_checked_at = None
+
+def _details(problem):
+    return {
+        "title": problem.title,
+        "description": problem.description,
+        "template_code": problem.template_code
+    }
+
+def _table_fingerprint():
+    return tuple(db.session.query(func.count(Problem.id), func.max(Problem.id), func.max(Problem.updated_at)).one())
+
+def _check_fresh():
+    """Drops the cache if the problem table changed since it was filled."""
+    global _fingerprint, _checked_at
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < current_app.config.get('CATALOG_CHECK_INTERVAL', 2):
+        return
+    fingerprint = _table_fingerprint()
+    if fingerprint != _fingerprint:
+        invalidate_catalog()
+        _fingerprint = fingerprint
+    _checked_at = now
+
+def get_problem_details(problem_id):
+    """Returns the cached title/description/template of a problem, or None if it doesn't exist."""
+    if problem_id is None:
+        return None
+    _check_fresh()
+    details = _problem_details.get(problem_id)
+    if details is None:
+        problem = db.session.get(Problem, problem_id)
+        if not problem:
+            return None
+        details = _problem_details[problem_id] = _details(problem)
+    return details
+
+def get_problem_list():
+    global _problem_list
+    _check_fresh()
+    if _problem_list is None:
+        _problem_list = [{"id": p.id, "title": p.title}
+                         for p in db.session.query(Problem.id, Problem.title).order_by(Problem.id).all()]
+    return _problem_list
+
+def warm_catalog():
+    """Loads every problem into the cache in one query."""
+    global _problem_list, _fingerprint, _checked_at
+    fingerprint = _table_fingerprint()
+    problems = Problem.query.order_by(Problem.id).all()
+    _problem_details.clear()
+    _problem_details.update({p.id: _details(p) for p in problems})
+    _problem_list = [{"id": p.id, "title": p.title} for p in problems]
+    _fingerprint, _checked_at = fingerprint, time.monotonic()
+    return len(problems)
+
+def invalidate_catalog():
+    global _problem_list, _checked_at
+    _problem_details.clear()
+    _problem_list = None
+    _checked_at = None
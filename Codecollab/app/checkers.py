@@ -0,0 +1,106 @@
+import importlib
+import math
+from itertools import zip_longest
+from flask import current_app
+
+# Output checkers, selected per problem by Problem.checker. Each one compares two
+# iterators of byte chunks (expected, actual) and stops reading at the first mismatch.
+# Format: {name: checker(expected_chunks, actual_chunks, options) -> (passed, message)}
+CHECKERS = {}
+
+DEFAULT_CHECKER = "whitespace"
+
+_custom_modules_loaded = False
+
+def register_checker(name):
+    """Registers a checker under a name that problems can select. Used for custom checkers too."""
+    def decorator(f):
+        CHECKERS[name] = f
+        return f
+    return decorator
+
+def get_checker(name):
+    """Returns the named checker, importing CHECKER_MODULES the first time a name is unknown."""
+    global _custom_modules_loaded
+    name = name or DEFAULT_CHECKER
+    if name not in CHECKERS and not _custom_modules_loaded:
+        _custom_modules_loaded = True
+        for module in (current_app.config.get('CHECKER_MODULES') or "").split(","):
+            if module.strip():
+                importlib.import_module(module.strip())
+    return CHECKERS.get(name)
+
+def iter_tokens(chunks):
+    """Yields whitespace-separated tokens from byte chunks, carrying a token cut across chunk boundaries."""
+    partial = b""
+    for chunk in chunks:
+        data = partial + chunk
+        if not data:
+            continue
+        tokens = data.split()
+        partial = b"" if data[-1:].isspace() or not tokens else tokens.pop()
+        yield from tokens
+    if partial:
+        yield partial
+
+def iter_lines(chunks):
+    """Yields lines (without the newline or a trailing \\r) from byte chunks. Trailing blank lines are dropped."""
+    partial = b""
+    blank = 0
+    for chunk in chunks:
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        for line in lines:
+            line = line.rstrip(b"\r")
+            # Hold blank lines back until we know they aren't trailing
+            if not line:
+                blank += 1
+                continue
+            yield from [b""] * blank
+            blank = 0
+            yield line
+    partial = partial.rstrip(b"\r")
+    if partial:
+        yield from [b""] * blank
+        yield partial
+
+def _show(value, limit=80):
+    text = value.decode('utf-8', errors='replace')
+    return repr(text if len(text) <= limit else text[:limit] + "...")
+
+def compare(expected, actual, equal, unit):
+    """Walks both sequences in step and reports the first difference; never reads past it."""
+    for index, (want, got) in enumerate(zip_longest(expected, actual), 1):
+        if want is None:
+            return False, f"Unexpected extra output at {unit} {index}: got {_show(got)}"
+        if got is None:
+            return False, f"Output ended early at {unit} {index}: expected {_show(want)}"
+        if not equal(want, got):
+            return False, f"Mismatch at {unit} {index}: expected {_show(want)}, got {_show(got)}"
+    return True, ""
+
+@register_checker("exact")
+def exact_checker(expected_chunks, actual_chunks, options):
+    """Line-by-line equality; only line endings and trailing blank lines are ignored."""
+    return compare(iter_lines(expected_chunks), iter_lines(actual_chunks), bytes.__eq__, "line")
+
+@register_checker("whitespace")
+def whitespace_checker(expected_chunks, actual_chunks, options):
+    """Token equality, ignoring how tokens are separated by spaces and newlines."""
+    return compare(iter_tokens(expected_chunks), iter_tokens(actual_chunks), bytes.__eq__, "token")
+
+@register_checker("float")
+def float_checker(expected_chunks, actual_chunks, options):
+    """Like whitespace, but numeric tokens only need to agree within abs_tol / rel_tol (default 1e-6)."""
+    abs_tol = float(options.get('abs_tol', 1e-6))
+    rel_tol = float(options.get('rel_tol', 1e-6))
+
+    def equal(want, got):
+        if want == got:
+            return True
+        try:
+            return math.isclose(float(got), float(want), rel_tol=rel_tol, abs_tol=abs_tol)
+        except ValueError:
+            return False
+
+    return compare(iter_tokens(expected_chunks), iter_tokens(actual_chunks), equal, "token")
@@ -1,19 +1,61 @@
-import docker
-from docker import errors as docker_errors
 import base64
+import os
+import tarfile
+from contextlib import contextmanager
+from app.metrics import track_executor
+from app.tracing import logger
 
-def run_code(user_code, language, test_input_args=""):
-    """
-    Runs code in a secure Docker container using Base64 encoding to prevent
-    syntax errors with complex code strings.
-    """
-    client = docker.from_env()
-    
-    image_name = ""
-    command = ""
-    
+# Sandbox image for each supported language
+LANGUAGE_IMAGES = {
+    'python': "python:3.9-slim",
+    'cpp': "gcc:latest",
+    'java': "openjdk:11-jdk-slim",
+}
+
+def _docker():
+    # The docker SDK is slow to import and only needed once code actually runs
+    import docker
+    return docker
+
+# Where streamed test input is placed inside the container
+INPUT_DIR = "/tmp"
+INPUT_NAME = "judge_input"
+INPUT_CHUNK_SIZE = 1024 * 1024
+
+def _input_archive(input_path):
+    """Yields a one-file tar stream of the input, read in chunks so it is never held in memory."""
+    info = tarfile.TarInfo(INPUT_NAME)
+    info.size = os.path.getsize(input_path)
+    info.mode = 0o444
+    yield info.tobuf()
+    with open(input_path, 'rb') as f:
+        while True:
+            chunk = f.read(INPUT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    # Pad the last block and close the archive with two empty blocks
+    yield b"\0" * (-info.size % tarfile.BLOCKSIZE) + b"\0" * (2 * tarfile.BLOCKSIZE)
+
+def _build_command(user_code, language, test_input_args="", input_path=None):
+    """Returns (image_name, command) for the language, or (None, None) if it is unsupported."""
     # We build a full script to execute inside the container.
-    if test_input_args:
+    if input_path:
+        # Same as below, but the arguments are read from the streamed input file
+        full_script = f"""
+# User's function definition
+{user_code}
+
+# Call the function with the test case arguments from the input file and print the result
+try:
+    with open("{INPUT_DIR}/{INPUT_NAME}") as _judge_input:
+        result = eval("solve(" + _judge_input.read() + ")")
+    print(result)
+except Exception as e:
+    import sys
+    print(e, file=sys.stderr)
+"""
+    elif test_input_args:
         # This logic is for the "Submit" button (judging test cases)
         full_script = f"""
 # User's function definition
@@ -35,27 +77,51 @@ except Exception as e:
     encoded_script = base64.b64encode(full_script.encode('utf-8')).decode('utf-8')
 
     if language == 'python':
-        image_name = "python:3.9-slim"
         # Decode the Base64 string and pipe it into the python interpreter
         command = f"/bin/sh -c \"echo {encoded_script} | base64 -d | python\""
     elif language == 'cpp':
-        image_name = "gcc:latest"
         # Decode to a file, compile, then run
         command = f"/bin/sh -c \"echo {encoded_script} | base64 -d > main.cpp && g++ -o main main.cpp && ./main\""
     elif language == 'java':
-        image_name = "openjdk:11-jdk-slim"
         # Decode to a file, compile, then run
         command = f"/bin/sh -c \"echo {encoded_script} | base64 -d > Main.java && javac Main.java && java Main\""
     else:
+        return None, None
+    return LANGUAGE_IMAGES[language], command
+
+def _pull_image(client, image_name, language):
+    """Pulls a missing image and returns the message to show instead of a result."""
+    try:
+        logger.info("Pulling image %s, this may take a moment", image_name)
+        with track_executor('pull', language):
+            client.images.pull(image_name)
+        logger.info("Pulled image %s", image_name)
+        return "Docker image was just pulled. Please run the code again."
+    except Exception as pull_error:
+        logger.warning("Failed to pull image %s: %s", image_name, pull_error)
+        return f"Failed to pull Docker image: {pull_error}"
+
+def run_code(user_code, language, test_input_args=""):
+    """
+    Runs code in a secure Docker container using Base64 encoding to prevent
+    syntax errors with complex code strings.
+    """
+    docker = _docker()
+    docker_errors = docker.errors
+    client = docker.from_env()
+
+    image_name, command = _build_command(user_code, language, test_input_args)
+    if image_name is None:
         return "", "Unsupported language"
     try:
-        container = client.containers.run(
-            image_name,
-            command,
-            detach=False,
-            remove=True,
-            network_disabled=True,
-        )
+        with track_executor('run', language):
+            container = client.containers.run(
+                image_name,
+                command,
+                detach=False,
+                remove=True,
+                network_disabled=True,
+            )
         output = container.decode('utf-8').strip()
         return output, ""
 
@@ -63,12 +129,97 @@ except Exception as e:
         error_message = e.stderr.decode('utf-8').strip()
         return "", error_message
     except docker_errors.ImageNotFound:
-        try:
-            print(f"Pulling image: {image_name}. This may take a moment...")
-            client.images.pull(image_name)
-            print("Image pulled successfully. Please try running the code again.")
-            return "", "Docker image was just pulled. Please run the code again."
-        except Exception as pull_error:
-            return "", f"Failed to pull Docker image: {pull_error}"
+        return "", _pull_image(client, image_name, language)
     except Exception as e:
         return "", str(e)
+
+class StreamedRun:
+    """
+    A judged run whose stdout is consumed while the program is still producing it.
+    Iterate stdout() for byte chunks, then call finish() for the error message.
+    """
+
+    def __init__(self, container=None, error=""):
+        self.container = container
+        self.error = error
+        self._exhausted = container is None
+
+    def stdout(self):
+        if self.container is None:
+            return
+        for chunk in self.container.logs(stdout=True, stderr=False, stream=True, follow=True):
+            yield chunk
+        self._exhausted = True
+
+    def finish(self):
+        """
+        Returns the run's error, or "" if it exited cleanly. A run whose output was
+        not read to the end (the checker already failed it) is killed instead.
+        """
+        if self.container is None or self.error:
+            return self.error
+        if not self._exhausted:
+            try:
+                self.container.kill()
+            except _docker().errors.APIError:
+                pass  # It exited on its own in the meantime
+            return ""
+        exit_status = self.container.wait()['StatusCode']
+        if exit_status != 0:
+            self.error = self.container.logs(stdout=False, stderr=True).decode('utf-8', errors='replace').strip()
+        return self.error
+
+@contextmanager
+def stream_code(user_code, language, test_input_args="", input_path=None):
+    """
+    Starts the code in a container and yields a StreamedRun, so the judge can check
+    output as it arrives. Large test inputs are passed as input_path and streamed
+    into the container instead of the command line. The container is removed on exit.
+    """
+    image_name, command = _build_command(user_code, language, test_input_args, input_path)
+    if image_name is None:
+        yield StreamedRun(error="Unsupported language")
+        return
+    docker = _docker()
+    client = docker.from_env()
+    container = None
+    try:
+        try:
+            with track_executor('start', language):
+                container = client.containers.create(image_name, command, network_disabled=True)
+                if input_path:
+                    container.put_archive(INPUT_DIR, _input_archive(input_path))
+                container.start()
+            run = StreamedRun(container)
+        except docker.errors.ImageNotFound:
+            run = StreamedRun(error=_pull_image(client, image_name, language))
+        except Exception as e:
+            run = StreamedRun(error=str(e))
+        with track_executor('run', language):
+            yield run
+    finally:
+        if container is not None:
+            container.remove(force=True)
+
+def warm_images(languages=None):
+    """
+    Pulls any missing sandbox image and starts one throwaway container per image, so
+    the first real run doesn't pay for the pull or a cold image cache.
+    Returns {image: error message or ""}.
+    """
+    docker = _docker()
+    client = docker.from_env()
+    results = {}
+    for language in languages or LANGUAGE_IMAGES:
+        image_name = LANGUAGE_IMAGES[language]
+        try:
+            try:
+                client.images.get(image_name)
+            except docker.errors.ImageNotFound:
+                with track_executor('pull', language):
+                    client.images.pull(image_name)
+            client.containers.run(image_name, "/bin/sh -c true", remove=True, network_disabled=True)
+            results[image_name] = ""
+        except Exception as e:
+            results[image_name] = str(e)
+    return results
@@ -0,0 +1,126 @@
+import time
+from functools import wraps
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND = 'replica'
+
+# Last time each room was written by this process, for read-your-writes routing
+# Format: {room_id: monotonic timestamp}
+_room_writes = {}
+# Entries older than the replica lag window no longer matter and are pruned about once per window
+_lag_window = 5.0
+_next_prune = 0.0
+
+class RoutingSession(Session):
+    """
+    Sends reads to the replica bind while a request is marked read-only, and
+    everything else (including any flush) to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('use_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def mark_room_written(room_id):
+    global _next_prune
+    if not room_id:
+        return
+    now = time.monotonic()
+    _room_writes[str(room_id)] = now
+    if now >= _next_prune:
+        cutoff = now - _lag_window
+        for key, written in list(_room_writes.items()):
+            if written < cutoff:
+                _room_writes.pop(key, None)
+        _next_prune = now + _lag_window
+
+def recently_written(room_id, window):
+    written = _room_writes.get(str(room_id))
+    return written is not None and time.monotonic() - written < window
+
+def _track_room_writes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        room_id = getattr(obj, 'room_id', None)
+        if room_id is None and type(obj).__name__ == 'Room':
+            room_id = obj.id
+        mark_room_written(room_id)
+
+def read_replica(room_arg='room_id'):
+    """
+    Marks a GET endpoint as safe to serve from the read replica. Rooms written in the
+    last REPLICA_LAG_WINDOW seconds are still read from the primary, so a client sees
+    its own edits even while the replica lags.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            from flask import current_app
+            room_id = kwargs.get(room_arg)
+            window = current_app.config.get('REPLICA_LAG_WINDOW', 5)
+            g.use_replica = (REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {})
+                             and not (room_id and recently_written(room_id, window))
+                             and request.headers.get('X-Read-Primary') is None)
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _is_file_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def configure_engines(app):
+    """Builds SQLALCHEMY_ENGINE_OPTIONS and the replica bind from the config before db.init_app()."""
+    config = app.config
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if _is_file_sqlite(uri):
+        if config.get('SQLITE_TUNING', True):
+            options.setdefault('pool_size', config.get('SQLITE_POOL_SIZE', 10))
+            options.setdefault('max_overflow', config.get('SQLITE_POOL_OVERFLOW', 10))
+            options.setdefault('connect_args', {'check_same_thread': False,
+                                                'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000})
+    elif make_url(uri).get_backend_name() != 'sqlite':
+        options.setdefault('pool_recycle', config.get('SQLALCHEMY_POOL_RECYCLE', 280))
+        options.setdefault('pool_timeout', config.get('SQLALCHEMY_POOL_TIMEOUT', 20))
+        options.setdefault('pool_pre_ping', config.get('SQLALCHEMY_POOL_PRE_PING', True))
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    replica_uri = config.get('READ_DATABASE_URL')
+    if replica_uri:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(REPLICA_BIND, replica_uri)
+        config['SQLALCHEMY_BINDS'] = binds
+
+def _apply_sqlite_pragmas(app):
+    busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers proceed while the socket handlers write
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-16000")
+        cursor.close()
+
+    return on_connect
+
+def init_app(app, db):
+    """Hooks SQLite pragmas and room write tracking once the engines exist."""
+    global _lag_window
+    with app.app_context():
+        if app.config.get('SQLITE_TUNING', True):
+            for engine in db.engines.values():
+                if _is_file_sqlite(str(engine.url)):
+                    event.listen(engine, 'connect', _apply_sqlite_pragmas(app))
+    # Write tracking is only needed to keep recently edited rooms off a lagging replica
+    _lag_window = app.config.get('REPLICA_LAG_WINDOW', 5)
+    if REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {}) and not event.contains(Session, 'after_flush', _track_room_writes):
+        event.listen(Session, 'after_flush', _track_room_writes)
@@ -0,0 +1,178 @@
+import gzip
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import event
+from app import db
+from app.database import RoutingSession
+from app.models import DocumentManifest, DocumentChunk, RoomColdStorage
+from app.rope import Rope
+
+# Most recently used room documents as of their last commit, so edits don't reload from the DB
+# Format: {room_id: (Rope, revision)}
+_documents = OrderedDict()
+
+# Chunk checksums known to be stored for each cached room
+# Format: {room_id: {'checksum1', 'checksum2', ...}}
+_persisted = {}
+
+def _cache(room_id, doc, persisted, revision):
+    _documents[room_id] = (doc, revision)
+    _documents.move_to_end(room_id)
+    _persisted[room_id] = persisted
+    limit = current_app.config.get('DOCUMENT_CACHE_SIZE', 256)
+    while len(_documents) > limit:
+        evicted, _ = _documents.popitem(last=False)
+        _persisted.pop(evicted, None)
+
+def evict_document(room_id):
+    _documents.pop(room_id, None)
+    _persisted.pop(room_id, None)
+
+def _pending(session):
+    """Documents saved in the session's open transaction, cached only once it commits.
+    Format: {room_id: (Rope, {'checksum1', ...}, revision)}"""
+    return session.info.setdefault('pending_documents', {})
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop('pending_documents', None)
+    if pending:
+        for room_id, (doc, persisted, revision) in pending.items():
+            _cache(room_id, doc, persisted, revision)
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_pending(session):
+    for room_id in session.info.pop('pending_documents', {}):
+        evict_document(room_id)
+
+def _load(room):
+    """Reads the stored document, returning (Rope, checksums of its stored chunks)."""
+    if room.hibernated:
+        cold = db.session.get(RoomColdStorage, room.id)
+        text = gzip.decompress(cold.content).decode('utf-8') if cold else ""
+        return Rope(text), set()
+    manifest = db.session.get(DocumentManifest, room.id)
+    if manifest:
+        chunks = dict(db.session.query(DocumentChunk.checksum, DocumentChunk.content)
+                      .filter_by(room_id=room.id).all())
+        return Rope.from_chunks(chunks[checksum] for checksum in manifest.checksums), set(chunks)
+    return Rope(room.code_content or ""), set()
+
+def get_document(room):
+    """
+    Returns the room's document as a Rope, loading it from inline text, chunks or
+    cold storage on a cache miss.
+    """
+    cached = _documents.get(room.id)
+    # A revision mismatch means another process (or a rolled-back save) changed the room
+    if cached is not None and cached[1] == room.revision:
+        _documents.move_to_end(room.id)
+        return cached[0]
+    doc, persisted = _load(room)
+    # Rows written earlier in this transaction aren't committed yet, so don't cache them
+    if room.id not in _pending(db.session):
+        _cache(room.id, doc, persisted, room.revision)
+    return doc
+
+def document_text(room):
+    return get_document(room).text()
+
+def save_document(room, doc, bump_revision=True):
+    """
+    Stages the document on the session (the caller commits) and bumps the room's
+    revision unless told not to. Small documents stay
+    inline in Room.code_content; large ones are stored as content-addressed chunks,
+    so an edit only writes the chunks it touched. The in-memory cache only picks up
+    the new state once the transaction commits.
+    """
+    threshold = current_app.config.get('DOCUMENT_CHUNK_THRESHOLD', 256 * 1024)
+    # The cached copy may already hold this uncommitted edit: drop it until the commit
+    cached_persisted = _persisted.get(room.id)
+    evict_document(room.id)
+    if bump_revision:
+        room.revision = (room.revision or 0) + 1
+    room.last_active_at = datetime.now(timezone.utc)
+    pending = _pending(db.session)
+    if room.hibernated:
+        # First write after hibernation: the document goes back to the hot tables below
+        db.session.query(RoomColdStorage).filter_by(room_id=room.id).delete(synchronize_session=False)
+        room.hibernated = False
+        persisted = set()
+    elif room.id in pending:
+        persisted = set(pending[room.id][1])
+    elif cached_persisted is not None:
+        persisted = set(cached_persisted)
+    else:
+        persisted = set(checksum for (checksum,) in db.session.query(DocumentChunk.checksum)
+                        .filter_by(room_id=room.id).all())
+
+    if len(doc) < threshold:
+        room.code_content = doc.text()
+        # Shrunk below the threshold: drop the chunked copy
+        if persisted:
+            db.session.query(DocumentManifest).filter_by(room_id=room.id).delete(synchronize_session=False)
+            db.session.query(DocumentChunk).filter_by(room_id=room.id).delete(synchronize_session=False)
+            persisted.clear()
+        pending[room.id] = (doc, persisted, room.revision)
+        return
+
+    leaves = list(doc.leaves())
+    checksums = [leaf.checksum for leaf in leaves]
+    manifest = db.session.get(DocumentManifest, room.id)
+    if not manifest:
+        manifest = DocumentManifest()
+        manifest.room_id = room.id
+        db.session.add(manifest)
+
+    for leaf, checksum in zip(leaves, checksums):
+        if checksum not in persisted:
+            chunk = DocumentChunk()
+            chunk.room_id = room.id
+            chunk.checksum = checksum
+            chunk.content = leaf.text
+            db.session.add(chunk)
+            persisted.add(checksum)
+
+    stale = persisted - set(checksums)
+    if stale:
+        db.session.query(DocumentChunk).filter(
+            DocumentChunk.room_id == room.id, DocumentChunk.checksum.in_(stale)
+        ).delete(synchronize_session=False)
+        persisted.difference_update(stale)
+
+    manifest.checksums = checksums
+    manifest.length = len(doc)
+    room.code_content = None
+    pending[room.id] = (doc, persisted, room.revision)
+
+def set_document_text(room, text):
+    """Replaces the room's document with new full text, keeping unchanged chunks."""
+    doc = get_document(room)
+    doc.set_text(text or "")
+    save_document(room, doc)
+    return doc
+
+def hibernate_document(room):
+    """
+    Stages moving the room's document to gzip-compressed cold storage (the caller
+    commits) and drops it from the hot tables and the in-memory cache.
+    Returns the compressed size in bytes.
+    """
+    pending = _pending(db.session).pop(room.id, None)
+    doc = pending[0] if pending else _load(room)[0]
+    text = doc.text()
+    cold = db.session.get(RoomColdStorage, room.id)
+    if not cold:
+        cold = RoomColdStorage()
+        cold.room_id = room.id
+        db.session.add(cold)
+    cold.content = gzip.compress(text.encode('utf-8'))
+    cold.length = len(text)
+    cold.hibernated_at = datetime.now(timezone.utc)
+    db.session.query(DocumentManifest).filter_by(room_id=room.id).delete(synchronize_session=False)
+    db.session.query(DocumentChunk).filter_by(room_id=room.id).delete(synchronize_session=False)
+    room.code_content = None
+    room.hibernated = True
+    evict_document(room.id)
+    return len(cold.content)
@@ -0,0 +1,286 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from bisect import bisect_left
+from flask import Blueprint, Response, request, abort, g
+from app import profiling, tracing
+
+# Blueprint for the Prometheus scrape endpoint
+bp = Blueprint('metrics', __name__)
+
+# Flipped on by install(); every hook checks it first so disabled metrics cost one lookup
+enabled = False
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+_lock = threading.Lock()
+_registry = {}
+_local = threading.local()
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in items)
+    return "{" + body + "}"
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Gauge:
+    """A gauge that is either set directly or computed by a callback at scrape time."""
+
+    def __init__(self, name, help_text, callback=None):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with _lock:
+            self.values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = self.values
+        if self.callback:
+            try:
+                values = {(): self.callback()}
+            except Exception:
+                values = {}
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with _lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+def _register(metric):
+    _registry[metric.name] = metric
+    return metric
+
+def counter(name, help_text):
+    return _registry.get(name) or _register(Counter(name, help_text))
+
+def gauge(name, help_text, callback=None):
+    return _registry.get(name) or _register(Gauge(name, help_text, callback))
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    return _registry.get(name) or _register(Histogram(name, help_text, buckets))
+
+def render():
+    lines = []
+    with _lock:
+        for metric in _registry.values():
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- Metrics recorded by the app ---
+socket_event_seconds = histogram('codecollab_socket_event_seconds', 'Socket.IO handler latency by event')
+socket_event_errors = counter('codecollab_socket_event_errors_total', 'Socket.IO handlers that raised')
+socket_event_queries = histogram('codecollab_socket_event_db_queries', 'DB statements issued per Socket.IO event', COUNT_BUCKETS)
+socket_event_commits = histogram('codecollab_socket_event_db_commits', 'DB commits per Socket.IO event', COUNT_BUCKETS)
+http_request_seconds = histogram('codecollab_http_request_seconds', 'HTTP route latency')
+db_queries = counter('codecollab_db_queries_total', 'DB statements issued')
+db_commits = counter('codecollab_db_commits_total', 'DB commits')
+executor_inflight = gauge('codecollab_executor_inflight', 'Code executions waiting on or running in a container')
+executor_seconds = histogram('codecollab_executor_seconds', 'Executor phase timings by language', DEFAULT_BUCKETS + (30.0, 60.0))
+socket_connections = gauge('codecollab_socket_connections', 'Connected Socket.IO clients')
+broadcast_bytes = counter('codecollab_broadcast_bytes_total', 'Serialized payload bytes emitted by event (sampled for unencoded payloads)')
+broadcast_messages = counter('codecollab_broadcast_messages_total', 'Messages emitted by event')
+
+def track_event(event_name):
+    """
+    Decorator for Socket.IO handlers: opens the call's sampled trace span (handlers get
+    it from tracing.current_span()), records latency and DB work for each call, and
+    profiles it while an on-demand profiling session matches (see app/profiling.py).
+    """
+    def decorator(f):
+        def measured(*args, **kwargs):
+            if not enabled:
+                return f(*args, **kwargs)
+            _local.queries = 0
+            _local.commits = 0
+            _local.active = True
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            except Exception:
+                socket_event_errors.inc(event=event_name)
+                raise
+            finally:
+                socket_event_seconds.observe(time.perf_counter() - start, event=event_name)
+                socket_event_queries.observe(_local.queries, event=event_name)
+                socket_event_commits.observe(_local.commits, event=event_name)
+                _local.active = False
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            data = args[0] if args else None
+            with tracing.event_span(event_name, data):
+                call = profiling.begin(event_name, data) if profiling.active else None
+                if call is None:
+                    return measured(*args, **kwargs)
+                try:
+                    return measured(*args, **kwargs)
+                finally:
+                    profiling.end(call)
+        return wrapper
+    return decorator
+
+class track_executor:
+    """Context manager timing one executor phase and tracking in-flight executions."""
+
+    def __init__(self, phase, language):
+        self.phase = phase
+        self.language = language
+        self.profile = profiling.phase('executor')
+
+    def __enter__(self):
+        self.profile.__enter__()
+        if enabled:
+            executor_inflight.inc()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if enabled:
+            executor_inflight.dec()
+            executor_seconds.observe(time.perf_counter() - self.start, phase=self.phase, language=self.language)
+        self.profile.__exit__(*exc)
+        return False
+
+def _on_execute(*args, **kwargs):
+    db_queries.inc()
+    if getattr(_local, 'active', False):
+        _local.queries += 1
+
+def _on_commit(*args, **kwargs):
+    db_commits.inc()
+    if getattr(_local, 'active', False):
+        _local.commits += 1
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - start, route=route, method=request.method,
+                                     status=response.status_code)
+    return response
+
+@contextmanager
+def emit_size(size):
+    """Reports the encoded frame size of the events emitted inside the block, for callers that already encoded them."""
+    _local.emit_size = size
+    try:
+        yield
+    finally:
+        _local.emit_size = None
+
+def _wrap_server_emit(server, sample_every=1):
+    original_emit = server.emit
+    # Format: {event: emits seen}
+    emitted = {}
+
+    @wraps(original_emit)
+    def emit(event, data=None, *args, **kwargs):
+        size = getattr(_local, 'emit_size', None)
+        if size is None:
+            # Sizing an unencoded payload means serializing it again, so only every
+            # sample_every-th emit of an event is measured and counted for the rest
+            seen = emitted[event] = emitted.get(event, 0) + 1
+            size = 0
+            if (seen - 1) % sample_every == 0:
+                try:
+                    size = len(json.dumps(data, separators=(',', ':'), default=str)) * sample_every
+                except (TypeError, ValueError):
+                    pass
+        broadcast_messages.inc(event=event)
+        broadcast_bytes.inc(size, event=event)
+        return original_emit(event, data, *args, **kwargs)
+
+    server.emit = emit
+
+def install(app, socketio, db):
+    """Hooks request, DB and emit instrumentation into the app when METRICS_ENABLED is set."""
+    global enabled
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    enabled = True
+    from sqlalchemy import event as sa_event
+    with app.app_context():
+        sa_event.listen(db.engine, 'before_cursor_execute', _on_execute)
+        sa_event.listen(db.engine, 'commit', _on_commit)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    _wrap_server_emit(socketio.server, max(1, app.config.get('METRICS_EMIT_SAMPLE', 10)))
+
+    from app.api_routes import active_users
+    from app.presence_reaper import reaper_metrics
+    gauge('codecollab_active_rooms', 'Rooms with at least one tracked user',
+          lambda: sum(1 for users in active_users.values() if users))
+    gauge('codecollab_presence_reaped', 'UserPresence rows removed by the reaper since start',
+          lambda: reaper_metrics['reaped_total'])
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    if not enabled:
+        abort(404)
+    return Response(render(), mimetype='text/plain; version=0.0.4')
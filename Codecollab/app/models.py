@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from app import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import JSON, func
@@ -20,6 +21,14 @@ class Room(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     problem_id = db.Column(db.Integer, db.ForeignKey('problem.id'), nullable=True)
     language = db.Column(db.String(20), nullable=False, default='python')
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Idle rooms are hibernated: their code moves to RoomColdStorage until the next access
+    last_active_at = db.Column(db.DateTime(timezone=True), nullable=True, server_default=func.now())
+    hibernated = db.Column(db.Boolean, nullable=False, default=False, server_default=expression.false())
+
+    __table_args__ = (
+        db.Index('idx_room_hot_activity', 'hibernated', 'last_active_at'),
+    )
 
 class Problem(db.Model):
     """Represents a coding problem."""
@@ -27,6 +36,12 @@ class Problem(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False) 
     template_code = db.Column(db.Text, nullable=True)
+    # How submissions are judged: a checker registered in app/checkers.py, plus its options
+    checker = db.Column(db.String(50), nullable=False, default='whitespace', server_default='whitespace')
+    checker_options = db.Column(JSON, nullable=True)
+    # Bumped on every ORM write so the in-memory catalog notices changes made by other processes
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=True, server_default=func.now(),
+                           default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     test_cases = db.relationship('TestCase', backref='problem', lazy=True, cascade="all, delete-orphan")
 
 class TestCase(db.Model):
@@ -36,6 +51,9 @@ class TestCase(db.Model):
     expected_output = db.Column(db.Text, nullable=False)
     is_hidden = db.Column(db.Boolean, default=True, nullable=False)
     problem_id = db.Column(db.Integer, db.ForeignKey('problem.id'), nullable=False)
+    # Imported data too large to keep inline is stored in the blob store; the text column is then empty
+    input_blob = db.Column(db.String(64), nullable=True)
+    output_blob = db.Column(db.String(64), nullable=True)
 
 class SessionEvent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -44,6 +62,31 @@ class SessionEvent(db.Model):
     payload = db.Column(JSON,nullable=False,default=dict)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
     
+class DocumentManifest(db.Model):
+    """Ordered chunk checksums for a room whose code is stored in DocumentChunk rows."""
+    room_id = db.Column(db.String(10), db.ForeignKey('room.id'), primary_key=True)
+    checksums = db.Column(JSON, nullable=False, default=list)
+    length = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+class DocumentChunk(db.Model):
+    """One content-addressed chunk of a large room document."""
+    id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(db.String(10), db.ForeignKey('room.id'), nullable=False)
+    checksum = db.Column(db.String(40), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_chunk_room_checksum', 'room_id', 'checksum', unique=True),
+    )
+
+class RoomColdStorage(db.Model):
+    """Gzip-compressed code of a hibernated room."""
+    room_id = db.Column(db.String(10), db.ForeignKey('room.id'), primary_key=True)
+    content = db.Column(db.LargeBinary, nullable=False)
+    length = db.Column(db.Integer, nullable=False, default=0)
+    hibernated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+
 class UserPresence(db.Model):
     id = db.Column(db.Integer, primary_key = True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -57,7 +100,7 @@ class UserPresence(db.Model):
     selection_end_column = db.Column(db.Integer, nullable=True)
     user_color = db.Column(db.String(7), nullable=False, default='#3B82F6')
     is_typing = db.Column(db.Boolean, default=False, nullable=False)
-    last_seen = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_seen = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
     
     __table_args__ = (
         db.Index('idx_room_user', 'room_id', 'username'),
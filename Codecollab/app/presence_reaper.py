@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+from app import db, socketio
+from app.models import UserPresence
+from app.tracing import logger
+
+# Counters exposed for monitoring the reaper
+reaper_metrics = {
+    "runs": 0,
+    "reaped_total": 0,
+    "last_reaped": 0,
+    "last_run_at": None,
+    "errors": 0,
+}
+
+_reaper_started = False
+
+def _delete_stale(rows, cutoff):
+    """
+    Deletes the selected rows that are still stale; a heartbeat may have refreshed some
+    since the SELECT. Returns (room_id, username) of the rows actually deleted.
+    """
+    ids = [row.id for row in rows]
+    stale = (db.delete(UserPresence)
+             .where(UserPresence.id.in_(ids), UserPresence.last_seen < cutoff)
+             .execution_options(synchronize_session=False))
+    if db.session.get_bind(UserPresence.__mapper__).dialect.delete_returning:
+        return db.session.execute(stale.returning(UserPresence.room_id, UserPresence.username)).all()
+    db.session.execute(stale)
+    kept = {id_ for (id_,) in db.session.query(UserPresence.id).filter(UserPresence.id.in_(ids))}
+    return [(row.room_id, row.username) for row in rows if row.id not in kept]
+
+def reap_stale_presence(ttl_seconds, batch_size=500):
+    """
+    Deletes UserPresence rows whose last_seen heartbeat is older than ttl_seconds.
+    Rows are removed in batches so a large backlog never holds one long transaction.
+    Returns the reaped usernames of each room that lost at least one user.
+    Format: {room_id: {'user1', 'user2', ...}}
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl_seconds)
+    affected_rooms = {}
+    reaped = 0
+    while True:
+        rows = (db.session.query(UserPresence.id, UserPresence.room_id, UserPresence.username)
+                .filter(UserPresence.last_seen < cutoff)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        removed = _delete_stale(rows, cutoff)
+        db.session.commit()
+        for room_id, username in removed:
+            affected_rooms.setdefault(room_id, set()).add(username)
+        reaped += len(removed)
+        if len(rows) < batch_size:
+            break
+
+    reaper_metrics["runs"] += 1
+    reaper_metrics["reaped_total"] += reaped
+    reaper_metrics["last_reaped"] = reaped
+    reaper_metrics["last_run_at"] = datetime.now(timezone.utc).isoformat()
+    return affected_rooms
+
+def forget_reaped_users(room_id, usernames):
+    """
+    Drops reaped users from this process's in-memory room state and tells the room
+    they left, the same way a socket disconnect does.
+    """
+    from app.api_routes import active_users, socket_sessions
+    if room_id in active_users:
+        active_users[room_id] = [user for user in active_users[room_id] if user['username'] not in usernames]
+    # Sockets whose disconnect never arrived; the missing heartbeat means they are gone
+    for sid, session in list(socket_sessions.items()):
+        if session['room_id'] == room_id and session['username'] in usernames:
+            socket_sessions.pop(sid, None)
+    for username in sorted(usernames):
+        socketio.emit('user_left', {'username': username}, to=room_id)
+
+def run_presence_reaper(app):
+    """Background loop: reap stale presence, announce who left and refresh the roster of affected rooms."""
+    from app.api_routes import broadcast_room_presence
+    ttl = app.config.get('PRESENCE_TTL_SECONDS', 120)
+    interval = app.config.get('PRESENCE_REAP_INTERVAL', 30)
+    batch_size = app.config.get('PRESENCE_REAP_BATCH_SIZE', 500)
+    while True:
+        socketio.sleep(interval)
+        with app.app_context():
+            try:
+                affected_rooms = reap_stale_presence(ttl, batch_size)
+                for room_id, usernames in affected_rooms.items():
+                    forget_reaped_users(room_id, usernames)
+                    broadcast_room_presence(room_id)
+                if affected_rooms:
+                    logger.info("presence_reaper reaped=%s rooms=%s", reaper_metrics['last_reaped'], len(affected_rooms))
+            except Exception as e:
+                db.session.rollback()
+                reaper_metrics["errors"] += 1
+                logger.error("presence_reaper cleanup failed: %s", e)
+            finally:
+                db.session.remove()
+
+def start_presence_reaper(app):
+    """Starts the reaper once per process. A non-positive interval disables it."""
+    global _reaper_started
+    if _reaper_started or app.config.get('PRESENCE_REAP_INTERVAL', 30) <= 0:
+        return
+    _reaper_started = True
+    socketio.start_background_task(run_presence_reaper, app)
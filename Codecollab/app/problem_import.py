@@ -0,0 +1,183 @@
+import json
+import posixpath
+import tarfile
+from flask import current_app
+from app import db
+from app.models import Problem, TestCase
+from app.blob_store import put_stream, remove_blob
+from app.catalog import invalidate_catalog
+from app.checkers import get_checker, DEFAULT_CHECKER
+
+# A problem package is a tar archive (optionally gzip/bz2/xz compressed) holding one
+# directory per problem:
+#
+#   two-sum/problem.json     {"title": ..., "description": ..., "template_code": ..., "visible": ["01"],
+#                             "checker": "float", "checker_options": {"abs_tol": 1e-6}}
+#   two-sum/tests/01.in
+#   two-sum/tests/01.out
+#
+# Tests run in name order. Tests listed in "visible" are shown to users, the rest are hidden.
+
+class PackageError(ValueError):
+    """Raised when an archive is not a valid problem package."""
+
+def _split_member(name):
+    parts = [p for p in posixpath.normpath(name).split('/') if p not in ('', '.')]
+    if '..' in parts:
+        raise PackageError(f"Unsafe path in archive: {name}")
+    return parts
+
+def _store_test_file(fileobj, size, inline_limit, stats, new_blobs):
+    """
+    Keeps small files inline, streams large ones into the blob store. Returns (text, digest).
+    Digests this import wrote for the first time are added to new_blobs.
+    """
+    if size <= inline_limit:
+        try:
+            return fileobj.read().decode('utf-8'), None
+        except UnicodeDecodeError:
+            raise PackageError("Test files must be UTF-8 text")
+    digest, written, created = put_stream(fileobj)
+    stats['blob_bytes'] += written
+    stats['blobs_written'] += int(created)
+    stats['blobs_reused'] += int(not created)
+    if created:
+        new_blobs.add(digest)
+    return "", digest
+
+def _remove_unreferenced_blobs(digests):
+    """Deletes the blobs among digests that no test case points to. Returns how many were removed."""
+    if not digests:
+        return 0
+    referenced = set()
+    for column in (TestCase.input_blob, TestCase.output_blob):
+        referenced.update(digest for (digest,) in db.session.query(column).filter(column.in_(digests)).distinct())
+    unreferenced = set(digests) - referenced
+    for digest in unreferenced:
+        remove_blob(digest)
+    return len(unreferenced)
+
+def _members(archive):
+    try:
+        yield from archive
+    except tarfile.TarError as e:
+        raise PackageError(f"Corrupt archive: {e}")
+
+def _read_package(fileobj, inline_limit, stats, new_blobs):
+    """
+    Walks the archive in stream mode, so members are read once in archive order and
+    test data never has to fit in memory.
+    Format: {directory: {"meta": {...}, "tests": {name: {"in": (text, digest), "out": (text, digest)}}}}
+    """
+    packages = {}
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode='r|*')
+    except tarfile.TarError as e:
+        raise PackageError(f"Not a tar archive: {e}")
+    with archive:
+        for member in _members(archive):
+            if not member.isfile():
+                continue
+            parts = _split_member(member.name)
+            if len(parts) < 2:
+                continue
+            package = packages.setdefault(parts[0], {"meta": None, "tests": {}})
+            if parts[1:] == ['problem.json']:
+                try:
+                    package["meta"] = json.load(archive.extractfile(member))
+                except ValueError as e:
+                    raise PackageError(f"{parts[0]}/problem.json is not valid JSON: {e}")
+            elif len(parts) == 3 and parts[1] == 'tests':
+                name, ext = posixpath.splitext(parts[2])
+                if ext not in ('.in', '.out'):
+                    continue
+                stored = _store_test_file(archive.extractfile(member), member.size, inline_limit, stats, new_blobs)
+                package["tests"].setdefault(name, {})[ext[1:]] = stored
+    return packages
+
+def _test_rows(directory, problem_id, tests, visible):
+    for name in sorted(tests):
+        files = tests[name]
+        if 'in' not in files or 'out' not in files:
+            raise PackageError(f"{directory}/tests/{name} needs both .in and .out files")
+        (input_text, input_blob), (output_text, output_blob) = files['in'], files['out']
+        yield {
+            "problem_id": problem_id,
+            "input_data": input_text,
+            "expected_output": output_text,
+            "input_blob": input_blob,
+            "output_blob": output_blob,
+            "is_hidden": name not in visible,
+        }
+
+def _upsert_problem(directory, meta, old_blobs):
+    """Creates or updates the problem described by meta. Blobs of a replaced test suite are added to old_blobs."""
+    if not isinstance(meta, dict) or not meta.get('title') or not meta.get('description'):
+        raise PackageError(f"{directory}/problem.json needs a title and a description")
+    checker = meta.get('checker') or DEFAULT_CHECKER
+    if get_checker(checker) is None:
+        raise PackageError(f"{directory}/problem.json uses an unknown checker: {checker}")
+    if not isinstance(meta.get('checker_options') or {}, dict):
+        raise PackageError(f"{directory}/problem.json: checker_options must be an object")
+    visible = meta.get('visible') or []
+    if not isinstance(visible, list) or not all(isinstance(name, str) for name in visible):
+        raise PackageError(f"{directory}/problem.json: visible must be a list of test names")
+    # Re-importing a problem with the same title replaces its statement and test suite
+    problem = Problem.query.filter_by(title=meta['title']).first()
+    replaced = problem is not None
+    if problem:
+        for input_blob, output_blob in (db.session.query(TestCase.input_blob, TestCase.output_blob)
+                                        .filter_by(problem_id=problem.id)):
+            old_blobs.update(digest for digest in (input_blob, output_blob) if digest)
+        TestCase.query.filter_by(problem_id=problem.id).delete(synchronize_session=False)
+    else:
+        problem = Problem()
+        db.session.add(problem)
+    problem.title = meta['title']
+    problem.description = meta['description']
+    problem.template_code = meta.get('template_code')
+    problem.checker = checker
+    problem.checker_options = meta.get('checker_options') or {}
+    db.session.flush()
+    return problem, replaced
+
+def import_package(fileobj, batch_size=None):
+    """
+    Imports every problem in a package archive in one transaction, inserting test
+    cases in bulk. Returns import statistics; raises PackageError on a bad archive.
+    Blobs left unreferenced by a failed import or a replaced test suite are deleted.
+    """
+    config = current_app.config
+    inline_limit = config.get('TESTCASE_INLINE_LIMIT', 4096)
+    batch_size = batch_size or config.get('IMPORT_BATCH_SIZE', 1000)
+    stats = {"problems_created": 0, "problems_replaced": 0, "test_cases": 0,
+             "blobs_written": 0, "blobs_reused": 0, "blob_bytes": 0, "blobs_removed": 0}
+    new_blobs, old_blobs = set(), set()
+    try:
+        packages = _read_package(fileobj, inline_limit, stats, new_blobs)
+        if not packages:
+            raise PackageError("Archive contains no problems")
+        for directory, package in sorted(packages.items()):
+            if package["meta"] is None:
+                raise PackageError(f"{directory} is missing problem.json")
+            problem, replaced = _upsert_problem(directory, package["meta"], old_blobs)
+            stats["problems_replaced" if replaced else "problems_created"] += 1
+            visible = set(package["meta"].get('visible') or [])
+            batch = []
+            for row in _test_rows(directory, problem.id, package["tests"], visible):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    db.session.execute(db.insert(TestCase), batch)
+                    stats["test_cases"] += len(batch)
+                    batch = []
+            if batch:
+                db.session.execute(db.insert(TestCase), batch)
+                stats["test_cases"] += len(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        _remove_unreferenced_blobs(new_blobs)
+        raise
+    stats["blobs_removed"] = _remove_unreferenced_blobs(old_blobs)
+    invalidate_catalog()
+    return stats
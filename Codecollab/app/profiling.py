@@ -0,0 +1,297 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import Blueprint, Response, current_app, jsonify, request
+from app.auth import admin_required
+
+# Admin-only endpoints for on-demand profiling of Socket.IO handlers
+bp = Blueprint('profiling', __name__, url_prefix='/api/admin/profiles')
+
+# True while at least one session may still be running; handlers check it before anything else
+active = False
+
+PHASES = ("db", "executor", "emit")
+
+_lock = threading.Lock()
+_local = threading.local()
+_hooks_installed = False
+# Profiled handler calls currently running, across threads/greenlets
+_inflight = 0
+
+# Profiling sessions of this process, newest last (finished ones are kept for download)
+# Format: {profile_id: ProfileSession}
+_sessions = OrderedDict()
+
+class ProfileSession:
+    """Aggregated timings and sampled stacks for one profiling window."""
+
+    def __init__(self, event, room_id, seconds, interval):
+        self.id = uuid.uuid4().hex[:12]
+        self.event = event
+        self.room_id = room_id
+        self.interval = interval
+        self.started_at = datetime.now(timezone.utc)
+        self.expires_at = self.started_at + timedelta(seconds=seconds)
+        self.deadline = time.monotonic() + seconds
+        # Format: {event: {"calls": 0, "wall": 0.0, "cpu": 0.0, "db": 0.0, "executor": 0.0, "emit": 0.0}}
+        self.handlers = {}
+        # Format: {"event;frame;frame": [wall seconds, cpu seconds]}
+        self.stacks = {}
+
+    @property
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    def matches(self, event, room_id):
+        return (self.running and (self.event is None or self.event == event)
+                and (self.room_id is None or self.room_id == room_id))
+
+    def add_call(self, call):
+        with _lock:
+            totals = self.handlers.setdefault(call.event, dict.fromkeys(("calls", "wall", "cpu") + PHASES, 0))
+            totals["calls"] += 1
+            totals["wall"] += call.wall
+            totals["cpu"] += call.cpu
+            for phase in PHASES:
+                totals[phase] += call.phases[phase]
+
+    def add_sample(self, stack, wall, cpu):
+        with _lock:
+            entry = self.stacks.setdefault(stack, [0.0, 0.0])
+            entry[0] += wall
+            entry[1] += cpu
+
+    def summary(self):
+        handlers = {}
+        for event, totals in self.handlers.items():
+            calls = totals["calls"] or 1
+            other = totals["wall"] - sum(totals[phase] for phase in PHASES)
+            handlers[event] = {
+                "calls": totals["calls"],
+                "wall_ms": round(totals["wall"] * 1000, 3),
+                "cpu_ms": round(totals["cpu"] * 1000, 3),
+                "avg_wall_ms": round(totals["wall"] * 1000 / calls, 3),
+                "phases_ms": {**{phase: round(totals[phase] * 1000, 3) for phase in PHASES},
+                              "other": round(max(other, 0) * 1000, 3)},
+            }
+        return {
+            "id": self.id,
+            "event": self.event,
+            "room_id": self.room_id,
+            "started_at": self.started_at.isoformat(),
+            "expires_at": self.expires_at.isoformat(),
+            "running": self.running,
+            "sample_interval_ms": self.interval * 1000,
+            "stacks": len(self.stacks),
+            "handlers": handlers,
+        }
+
+    def collapsed(self, weight="wall"):
+        """Folded stacks ("frame;frame;frame count", count in microseconds) for flamegraph.pl or speedscope."""
+        index = 0 if weight == "wall" else 1
+        lines = []
+        with _lock:
+            for stack, values in sorted(self.stacks.items()):
+                micros = int(values[index] * 1_000_000)
+                if micros > 0:
+                    lines.append(f"{stack} {micros}")
+        return "\n".join(lines) + "\n"
+
+class _Call:
+    """One profiled handler invocation."""
+
+    def __init__(self, sessions, event, root_frame):
+        self.sessions = sessions
+        self.event = event
+        self.root_frame = root_frame
+        self.interval = min(session.interval for session in sessions)
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.start = self.last_sample = time.perf_counter()
+        self.start_cpu = self.last_cpu = time.thread_time()
+        self.last_stack = event
+        self.wall = self.cpu = 0.0
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _stack_of(call, frame):
+    """Collapsed stack from the handler down to frame, or None if frame isn't running inside it."""
+    labels = []
+    # The frame directly under the decorator's wrapper is its metrics layer, not the handler
+    while frame is not None and frame.f_back is not call.root_frame:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return ";".join([call.event] + labels[::-1])
+
+def _record_sample(call, stack):
+    now, cpu = time.perf_counter(), time.thread_time()
+    for session in call.sessions:
+        session.add_sample(stack, now - call.last_sample, cpu - call.last_cpu)
+    call.last_sample, call.last_cpu, call.last_stack = now, cpu, stack
+
+def _sample(frame, event, arg):
+    # Runs on every Python call/return while profiled handlers are in flight, but only
+    # walks the stack once per interval. Time a handler spends suspended on I/O lands on
+    # the frame it resumes in, which is what a wall-clock flamegraph should show.
+    call = getattr(_local, 'call', None)
+    if call is None:
+        if not _inflight:
+            sys.setprofile(None)  # Left over on a thread that has nothing to profile anymore
+        return
+    if time.perf_counter() - call.last_sample >= call.interval:
+        stack = _stack_of(call, frame)
+        if stack:
+            _record_sample(call, stack)
+
+def begin(event, data):
+    """Starts profiling a handler call if a running session matches it. Returns a token for end()."""
+    global active, _inflight
+    room_id = data.get('room_id') if isinstance(data, dict) else None
+    with _lock:
+        sessions = [s for s in _sessions.values() if s.matches(event, room_id)]
+        if not sessions:
+            if not any(s.running for s in _sessions.values()):
+                active = False
+            return None
+        _inflight += 1
+    call = _Call(sessions, event, sys._getframe(1))
+    _local.call = call
+    # Don't displace a debugger or another profiler; phases are still recorded
+    if sys.getprofile() in (None, _sample):
+        sys.setprofile(_sample)
+    return call
+
+def end(call):
+    global _inflight
+    _local.call = None
+    with _lock:
+        _inflight -= 1
+        if not _inflight and sys.getprofile() is _sample:
+            sys.setprofile(None)
+    _record_sample(call, call.last_stack)
+    call.wall = time.perf_counter() - call.start
+    call.cpu = time.thread_time() - call.start_cpu
+    for session in call.sessions:
+        session.add_call(call)
+
+class phase:
+    """Context manager attributing the enclosed time to a phase of the current profiled call."""
+
+    def __init__(self, name):
+        self.name = name
+        self.call = None
+
+    def __enter__(self):
+        if active:
+            self.call = getattr(_local, 'call', None)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.call is not None:
+            self.call.phases[self.name] += time.perf_counter() - self.start
+        return False
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if active and getattr(_local, 'call', None) is not None:
+        conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('profile_query_start')
+    call = getattr(_local, 'call', None)
+    if starts:
+        start = starts.pop()
+        if call is not None:
+            call.phases["db"] += time.perf_counter() - start
+
+def _install_hooks():
+    """DB and emit hooks are added the first time profiling is used, so they cost nothing before that."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+    from sqlalchemy import event as sa_event
+    from app import db, socketio
+    for engine in db.engines.values():
+        sa_event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        sa_event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    server = socketio.server
+    original_emit = server.emit
+
+    @wraps(original_emit)
+    def emit(*args, **kwargs):
+        with phase("emit"):
+            return original_emit(*args, **kwargs)
+
+    server.emit = emit
+
+def start_session(event=None, room_id=None, seconds=30):
+    global active
+    config = current_app.config
+    seconds = max(1, min(int(seconds), config.get('PROFILING_MAX_SECONDS', 300)))
+    interval = config.get('PROFILING_SAMPLE_INTERVAL_MS', 1) / 1000
+    _install_hooks()
+    session = ProfileSession(event, room_id, seconds, interval)
+    with _lock:
+        _sessions[session.id] = session
+        while len(_sessions) > config.get('PROFILING_KEEP_SESSIONS', 20):
+            _sessions.popitem(last=False)
+        active = True
+    return session
+
+@bp.route('', methods=['POST'])
+@admin_required
+def create_profile():
+    data = request.get_json(silent=True) or {}
+    if not data.get('event') and not data.get('room_id'):
+        return jsonify({"error": "Give an event, a room_id, or both"}), 400
+    try:
+        seconds = int(data.get('seconds', 30))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds must be an integer"}), 400
+    session = start_session(data.get('event'), data.get('room_id'), seconds)
+    return jsonify(session.summary()), 201
+
+@bp.route('', methods=['GET'])
+@admin_required
+def list_profiles():
+    return jsonify([session.summary() for session in reversed(_sessions.values())]), 200
+
+@bp.route('/<string:profile_id>', methods=['GET'])
+@admin_required
+def get_profile(profile_id):
+    session = _sessions.get(profile_id)
+    if not session:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify(session.summary()), 200
+
+@bp.route('/<string:profile_id>', methods=['DELETE'])
+@admin_required
+def stop_profile(profile_id):
+    session = _sessions.get(profile_id)
+    if not session:
+        return jsonify({"error": "Profile not found"}), 404
+    session.deadline = min(session.deadline, time.monotonic())
+    session.expires_at = min(session.expires_at, datetime.now(timezone.utc))
+    return jsonify(session.summary()), 200
+
+@bp.route('/<string:profile_id>/flamegraph', methods=['GET'])
+@admin_required
+def download_flamegraph(profile_id):
+    session = _sessions.get(profile_id)
+    if not session:
+        return jsonify({"error": "Profile not found"}), 404
+    weight = request.args.get('weight', 'wall')
+    if weight not in ('wall', 'cpu'):
+        return jsonify({"error": "weight must be wall or cpu"}), 400
+    return Response(session.collapsed(weight), mimetype='text/plain', headers={
+        "Content-Disposition": f'attachment; filename="profile-{profile_id}-{weight}.folded"'
+    })
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import or_
+from app import db, socketio
+from app.models import Room, UserPresence
+from app.documents import get_document, save_document, hibernate_document
+from app.tracing import logger
+
+# Counters exposed for monitoring the hibernator
+hibernation_metrics = {
+    "runs": 0,
+    "hibernated_total": 0,
+    "last_hibernated_idle": 0,
+    "last_hibernated_over_limit": 0,
+    "compressed_bytes_total": 0,
+    "rehydrated_total": 0,
+    "last_run_at": None,
+    "errors": 0,
+}
+
+_hibernator_started = False
+
+def touch_room(room_id):
+    """
+    Stages a last-activity bump for a room that is being joined (the caller commits),
+    moving its document back to the hot tables if it was hibernated.
+    """
+    room = db.session.get(Room, room_id)
+    if not room:
+        return None
+    if room.hibernated:
+        save_document(room, get_document(room), bump_revision=False)
+        hibernation_metrics["rehydrated_total"] += 1
+    room.last_active_at = datetime.now(timezone.utc)
+    return room
+
+def _evict_room_state(room_id):
+    from app.api_routes import active_users
+    active_users.pop(room_id, None)
+
+def _claim_for_hibernation(room):
+    """
+    Flags the room hibernated only if nobody edited, rehydrated or joined it since it
+    was selected. The UPDATE also holds the row until commit, so a concurrent save
+    waits for the hibernation instead of being lost. Returns False if the room changed.
+    """
+    occupied = db.session.query(UserPresence.id).filter(UserPresence.room_id == room.id).exists()
+    claimed = (db.session.query(Room)
+               .filter(Room.id == room.id, Room.revision == room.revision,
+                       Room.hibernated.is_(False), ~occupied)
+               .update({Room.hibernated: True}, synchronize_session=False))
+    return claimed == 1
+
+def _hibernate_batch(query, limit):
+    """
+    Hibernates up to limit rooms from query in one transaction. Rooms that changed
+    since they were selected are skipped. Returns how many were moved.
+    """
+    rooms = [room for room in query.limit(limit).all() if _claim_for_hibernation(room)]
+    for room in rooms:
+        hibernation_metrics["compressed_bytes_total"] += hibernate_document(room)
+    db.session.commit()
+    for room in rooms:
+        _evict_room_state(room.id)
+    return len(rooms)
+
+def hibernate_idle_rooms(idle_seconds, hot_limit=0, batch_size=200):
+    """
+    Moves rooms nobody is present in to cold storage: first every room idle for
+    longer than idle_seconds, then, while more than hot_limit rooms are still hot,
+    the least recently active ones. Works in batches so a large backlog never holds
+    one long transaction. Returns (idle rooms hibernated, over-limit rooms hibernated).
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=idle_seconds)
+    occupied = db.session.query(UserPresence.id).filter(UserPresence.room_id == Room.id).exists()
+    candidates = Room.query.filter(Room.hibernated.is_(False), ~occupied)
+
+    idle = 0
+    idle_rooms = candidates.filter(or_(Room.last_active_at.is_(None), Room.last_active_at < cutoff))
+    while True:
+        moved = _hibernate_batch(idle_rooms, batch_size)
+        idle += moved
+        if moved < batch_size:
+            break
+
+    over_limit = 0
+    if hot_limit > 0:
+        excess = Room.query.filter(Room.hibernated.is_(False)).count() - hot_limit
+        lru_rooms = candidates.order_by(Room.last_active_at.asc())
+        while excess > 0:
+            moved = _hibernate_batch(lru_rooms, min(excess, batch_size))
+            over_limit += moved
+            excess -= moved
+            if not moved:
+                break
+
+    hibernation_metrics["runs"] += 1
+    hibernation_metrics["hibernated_total"] += idle + over_limit
+    hibernation_metrics["last_hibernated_idle"] = idle
+    hibernation_metrics["last_hibernated_over_limit"] = over_limit
+    hibernation_metrics["last_run_at"] = datetime.now(timezone.utc).isoformat()
+    return idle, over_limit
+
+def run_room_hibernator(app):
+    """Background loop: hibernate idle rooms and keep the hot set under ROOM_HOT_LIMIT."""
+    idle_seconds = app.config.get('ROOM_IDLE_SECONDS', 3 * 24 * 3600)
+    hot_limit = app.config.get('ROOM_HOT_LIMIT', 0)
+    interval = app.config.get('ROOM_HIBERNATE_INTERVAL', 300)
+    batch_size = app.config.get('ROOM_HIBERNATE_BATCH_SIZE', 200)
+    while True:
+        socketio.sleep(interval)
+        with app.app_context():
+            try:
+                idle, over_limit = hibernate_idle_rooms(idle_seconds, hot_limit, batch_size)
+                if idle or over_limit:
+                    logger.info("room_hibernator idle=%s over_limit=%s", idle, over_limit)
+            except Exception as e:
+                db.session.rollback()
+                hibernation_metrics["errors"] += 1
+                logger.error("room_hibernator failed: %s", e)
+            finally:
+                db.session.remove()
+
+def start_room_hibernator(app):
+    """Starts the hibernator once per process. A non-positive interval disables it."""
+    global _hibernator_started
+    if _hibernator_started or app.config.get('ROOM_HIBERNATE_INTERVAL', 300) <= 0:
+        return
+    _hibernator_started = True
+    socketio.start_background_task(run_room_hibernator, app)
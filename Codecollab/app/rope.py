@@ -0,0 +1,258 @@
+import hashlib
+import random
+
+# Leaves are cut at a newline when one falls in the window, so chunks stay line-aligned
+MAX_LEAF = 4096
+
+class _Node:
+    """A treap node holding one immutable text chunk plus subtree aggregates."""
+
+    __slots__ = ('text', 'text_lines', 'prio', 'left', 'right', 'size', 'lines', 'count', '_checksum')
+
+    def __init__(self, text):
+        self.text = text
+        self.text_lines = text.count('\n')
+        self.prio = random.random()
+        self.left = None
+        self.right = None
+        self.size = len(text)
+        self.lines = self.text_lines
+        self.count = 1
+        self._checksum = None
+
+    @property
+    def checksum(self):
+        # Text never changes after creation, so the hash is computed at most once
+        if self._checksum is None:
+            self._checksum = hashlib.sha1(self.text.encode('utf-8')).hexdigest()
+        return self._checksum
+
+def _update(node):
+    left, right = node.left, node.right
+    node.size = len(node.text) + (left.size if left else 0) + (right.size if right else 0)
+    node.lines = node.text_lines + (left.lines if left else 0) + (right.lines if right else 0)
+    node.count = 1 + (left.count if left else 0) + (right.count if right else 0)
+
+def _merge(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prio > b.prio:
+        a.right = _merge(a.right, b)
+        _update(a)
+        return a
+    b.left = _merge(a, b.left)
+    _update(b)
+    return b
+
+def _split(node, k):
+    """Splits a treap into (first k characters, rest). A chunk straddling k is cut in two."""
+    if node is None:
+        return None, None
+    left_size = node.left.size if node.left else 0
+    if k <= left_size:
+        left, right = _split(node.left, k)
+        node.left = right
+        _update(node)
+        return left, node
+    if k >= left_size + len(node.text):
+        left, right = _split(node.right, k - left_size - len(node.text))
+        node.right = left
+        _update(node)
+        return node, right
+    cut = k - left_size
+    return (_merge(node.left, _Node(node.text[:cut])),
+            _merge(_Node(node.text[cut:]), node.right))
+
+def _chunks(text):
+    start = 0
+    while start < len(text):
+        end = min(start + MAX_LEAF, len(text))
+        if end < len(text):
+            newline = text.rfind('\n', start + MAX_LEAF // 2, end)
+            if newline != -1:
+                end = newline + 1
+        yield text[start:end]
+        start = end
+
+def _build(chunks):
+    root = None
+    for chunk in chunks:
+        if chunk:
+            root = _merge(root, _Node(chunk))
+    return root
+
+def _common_prefix(a, b):
+    """Length of the common prefix, found by comparing slices so the work stays in C."""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+class Rope:
+    """
+    Line-indexed rope over a randomized treap of text chunks.
+
+    Positional edits, slicing and line/column <-> offset conversion are
+    O(log n) in the number of chunks. Lines and columns are 1-based, the
+    same as the editor's cursor positions stored in UserPresence.
+    """
+
+    def __init__(self, text=""):
+        self.root = _build(_chunks(text or ""))
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Rebuilds a rope from persisted leaves, keeping their boundaries (and checksums)."""
+        rope = cls()
+        rope.root = _build(chunks)
+        return rope
+
+    def __len__(self):
+        return self.root.size if self.root else 0
+
+    @property
+    def line_count(self):
+        return (self.root.lines if self.root else 0) + 1
+
+    def leaves(self):
+        """In-order chunk nodes."""
+        stack, node = [], self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node
+            node = node.right
+
+    def text(self):
+        return "".join(leaf.text for leaf in self.leaves())
+
+    def slice(self, start, end):
+        start, end = max(0, start), min(len(self), end)
+        parts = []
+
+        def visit(node, base):
+            if node is None or base >= end or base + node.size <= start:
+                return
+            visit(node.left, base)
+            text_start = base + (node.left.size if node.left else 0)
+            text_end = text_start + len(node.text)
+            if text_start < end and text_end > start:
+                parts.append(node.text[max(start - text_start, 0):min(end - text_start, len(node.text))])
+            visit(node.right, text_end)
+
+        if start < end:
+            visit(self.root, 0)
+        return "".join(parts)
+
+    def insert(self, offset, text):
+        if not text:
+            return
+        offset = max(0, min(offset, len(self)))
+        left, right = _split(self.root, offset)
+        # Grow the preceding chunk while it is small, so typing does not add one leaf per keystroke
+        if left is not None:
+            last = left
+            while last.right:
+                last = last.right
+            if len(last.text) + len(text) <= MAX_LEAF:
+                left, _ = _split(left, left.size - len(last.text))
+                text = last.text + text
+        self.root = _merge(_merge(left, _build(_chunks(text))), right)
+        self._maybe_compact()
+
+    def delete(self, start, end):
+        start, end = max(0, start), min(len(self), end)
+        if start >= end:
+            return
+        left, rest = _split(self.root, start)
+        _, right = _split(rest, end - start)
+        self.root = _merge(left, right)
+        self._maybe_compact()
+
+    def replace(self, start, end, text):
+        self.delete(start, end)
+        self.insert(start, text)
+
+    def set_text(self, new_text):
+        """
+        Replaces the whole document, touching only the span between the common
+        prefix and suffix, so unchanged chunks (and their persisted rows) are kept.
+        """
+        old_text = self.text()
+        if old_text == new_text:
+            return
+        prefix = _common_prefix(old_text, new_text)
+        suffix = _common_prefix(old_text[prefix:][::-1], new_text[prefix:][::-1])
+        self.replace(prefix, len(old_text) - suffix, new_text[prefix:len(new_text) - suffix])
+
+    def _maybe_compact(self):
+        # Many small leaves from scattered edits make the tree deeper and persistence chattier
+        if self.root and self.root.count > 2 * (self.root.size // MAX_LEAF) + 64:
+            self.root = _build(_chunks(self.text()))
+
+    def _newlines_before(self, offset):
+        count, node = 0, self.root
+        while node:
+            left_size = node.left.size if node.left else 0
+            if offset <= left_size:
+                node = node.left
+                continue
+            count += node.left.lines if node.left else 0
+            offset -= left_size
+            if offset <= len(node.text):
+                return count + node.text.count('\n', 0, offset)
+            count += node.text_lines
+            offset -= len(node.text)
+            node = node.right
+        return count
+
+    def _newline_offset(self, n):
+        """Offset of the n-th (1-based) newline character, or None if there are fewer."""
+        base, node = 0, self.root
+        while node:
+            left_lines = node.left.lines if node.left else 0
+            if n <= left_lines:
+                node = node.left
+                continue
+            n -= left_lines
+            base += node.left.size if node.left else 0
+            in_text = node.text_lines
+            if n <= in_text:
+                index = -1
+                for _ in range(n):
+                    index = node.text.index('\n', index + 1)
+                return base + index
+            n -= in_text
+            base += len(node.text)
+            node = node.right
+        return None
+
+    def line_start(self, line):
+        if line <= 1:
+            return 0
+        newline = self._newline_offset(line - 1)
+        return len(self) if newline is None else newline + 1
+
+    def line_end(self, line):
+        """Offset just before the line's newline (or the end of the document)."""
+        newline = self._newline_offset(max(line, 1))
+        return len(self) if newline is None else newline
+
+    def offset_to_position(self, offset):
+        offset = max(0, min(offset, len(self)))
+        line = self._newlines_before(offset) + 1
+        return line, offset - self.line_start(line) + 1
+
+    def position_to_offset(self, line, column):
+        """Converts a 1-based line/column to an offset, clamped to the document."""
+        line = max(1, min(int(line), self.line_count))
+        start = self.line_start(line)
+        return max(start, min(start + int(column) - 1, self.line_end(line)))
@@ -0,0 +1,163 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models import SessionEvent, UserPresence
+
+SUMMARY_EVENT_TYPE = "code_change_summary"
+
+def event_to_dict(event):
+    return {
+        'id': event.id,
+        'event_type': event.event_type,
+        'payload': event.payload,
+        'created_at': event.created_at.isoformat() if event.created_at else None
+    }
+
+def event_started_at(event):
+    """When a timeline event began. A compacted run is stamped with its last event, so use first_at."""
+    if event['event_type'] == SUMMARY_EVENT_TYPE:
+        return (event['payload'] or {}).get('first_at') or event['created_at']
+    return event['created_at']
+
+def _archive_dir():
+    path = current_app.config.get('SESSION_ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'session_archive')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def archive_path(room_id):
+    # Room ids are short hex strings, but never let one escape the archive directory
+    safe_id = "".join(c for c in str(room_id) if c.isalnum() or c in "-_")
+    return os.path.join(_archive_dir(), f"{safe_id}.ndjson.gz")
+
+def read_archived_events(room_id):
+    """Returns the archived events of a room, oldest first. Missing archives yield an empty list."""
+    path = archive_path(room_id)
+    if not os.path.exists(path):
+        return []
+    events = {}
+    # Each archive run appends a new gzip member; gzip reads them back as one stream
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                event = json.loads(line)
+                # A retried archive run can write the same event twice, but SQLite may
+                # also hand a purged event's id to a newer one, so the id alone isn't a key
+                events[(event['id'], event['created_at'], event['event_type'])] = event
+    return sorted(events.values(), key=lambda e: (e['created_at'] or "", e['id']))
+
+def load_session_events(room_id):
+    """Archived plus live events for a room, oldest first, in the timeline dict format."""
+    live = (db.session.query(SessionEvent)
+            .filter_by(room_id=room_id)
+            .order_by(SessionEvent.created_at, SessionEvent.id)
+            .all())
+    return read_archived_events(room_id) + [event_to_dict(e) for e in live]
+
+def _summarize_run(room_id, run):
+    first, last = run[0], run[-1]
+    summary = SessionEvent()
+    summary.room_id = room_id
+    summary.event_type = SUMMARY_EVENT_TYPE
+    summary.created_at = last.created_at
+    summary.payload = {
+        "collapsed": len(run),
+        "first_at": first.created_at.isoformat() if first.created_at else None,
+        "last_at": last.created_at.isoformat() if last.created_at else None,
+        "final_length": (last.payload or {}).get("length"),
+        "last_message_id": (last.payload or {}).get("message_id"),
+    }
+    return summary
+
+def compact_room(room_id, cutoff, dry_run=False):
+    """
+    Collapses consecutive code_change events older than cutoff into a single
+    code_change_summary event. Returns the number of rows removed.
+    """
+    events = (db.session.query(SessionEvent)
+              .filter(SessionEvent.room_id == room_id, SessionEvent.created_at < cutoff)
+              .order_by(SessionEvent.created_at, SessionEvent.id)
+              .all())
+    runs, run = [], []
+    for event in events:
+        if event.event_type == "code_change":
+            run.append(event)
+            continue
+        if len(run) > 1:
+            runs.append(run)
+        run = []
+    if len(run) > 1:
+        runs.append(run)
+
+    removed = sum(len(r) - 1 for r in runs)
+    if dry_run or not runs:
+        return removed
+    for r in runs:
+        db.session.add(_summarize_run(room_id, r))
+        for event in r:
+            db.session.delete(event)
+    db.session.commit()
+    return removed
+
+def archive_room(room_id, dry_run=False):
+    """Appends every live event of a room to its compressed archive and removes the rows."""
+    events = (db.session.query(SessionEvent)
+              .filter_by(room_id=room_id)
+              .order_by(SessionEvent.created_at, SessionEvent.id)
+              .all())
+    if dry_run or not events:
+        return len(events)
+    with gzip.open(archive_path(room_id), 'at', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event_to_dict(event), separators=(',', ':')) + "\n")
+    # Rows are only deleted once the archive write has succeeded
+    db.session.query(SessionEvent).filter(
+        SessionEvent.id.in_([e.id for e in events])
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return len(events)
+
+def run_retention(compact_after_days=None, archive_after_days=None, dry_run=False, limit=None):
+    """
+    Compacts code_change runs older than compact_after_days and archives rooms
+    whose last event is older than archive_after_days and that have nobody present.
+    """
+    config = current_app.config
+    if compact_after_days is None:
+        compact_after_days = config.get('SESSION_COMPACT_AFTER_DAYS', 1)
+    if archive_after_days is None:
+        archive_after_days = config.get('SESSION_ARCHIVE_AFTER_DAYS', 30)
+    now = datetime.now(timezone.utc)
+    stats = {"rooms_compacted": 0, "events_compacted": 0, "rooms_archived": 0, "events_archived": 0}
+
+    compact_cutoff = now - timedelta(days=compact_after_days)
+    query = (db.session.query(SessionEvent.room_id)
+             .filter(SessionEvent.event_type == "code_change", SessionEvent.created_at < compact_cutoff)
+             .group_by(SessionEvent.room_id)
+             .having(func.count(SessionEvent.id) > 1))
+    if limit:
+        query = query.limit(limit)
+    for (room_id,) in query.all():
+        removed = compact_room(room_id, compact_cutoff, dry_run=dry_run)
+        if removed:
+            stats["rooms_compacted"] += 1
+            stats["events_compacted"] += removed
+
+    archive_cutoff = now - timedelta(days=archive_after_days)
+    active_rooms = db.session.query(UserPresence.room_id).distinct()
+    query = (db.session.query(SessionEvent.room_id)
+             .filter(SessionEvent.room_id.notin_(active_rooms))
+             .group_by(SessionEvent.room_id)
+             .having(func.max(SessionEvent.created_at) < archive_cutoff))
+    if limit:
+        query = query.limit(limit)
+    for (room_id,) in query.all():
+        archived = archive_room(room_id, dry_run=dry_run)
+        if archived:
+            stats["rooms_archived"] += 1
+            stats["events_archived"] += archived
+    return stats
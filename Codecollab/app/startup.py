@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+from app import db, socketio
+from app.tracing import logger
+
+# Liveness and readiness probes, served at the root so load balancers can reach them
+bp = Blueprint('startup', __name__)
+
+# Warm-up phases of this process, in the order they run
+# Format: {phase: {"status": "pending" | "running" | "done" | "failed", "detail": ..., "finished_at": ...}}
+PHASES = ("catalog", "executor")
+startup_state = {phase: {"status": "pending", "detail": None, "finished_at": None} for phase in PHASES}
+
+_warmup_started = False
+
+def _run_phase(phase, task):
+    state = startup_state[phase]
+    state["status"] = "running"
+    try:
+        state["detail"] = task()
+        state["status"] = "done"
+    except Exception as e:
+        state["status"] = "failed"
+        state["detail"] = str(e)
+        logger.error("startup phase %s failed: %s", phase, e)
+    state["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+def _warm_catalog():
+    from app.catalog import warm_catalog
+    return {"problems": warm_catalog()}
+
+def _warm_executor():
+    from app.code_executor import warm_images
+    results = warm_images()
+    failed = {image: error for image, error in results.items() if error}
+    if failed:
+        raise RuntimeError("; ".join(f"{image}: {error}" for image, error in failed.items()))
+    return {"images": sorted(results)}
+
+def run_warmup(app):
+    """
+    Background task: fill the problem catalog cache, then pull and warm the sandbox
+    images. The executor phase is retried until Docker is reachable.
+    """
+    with app.app_context():
+        try:
+            _run_phase("catalog", _warm_catalog)
+        finally:
+            db.session.remove()
+    if app.config.get('STARTUP_WARM_EXECUTOR', True):
+        retry_interval = app.config.get('STARTUP_RETRY_INTERVAL', 30)
+        _run_phase("executor", _warm_executor)
+        while startup_state["executor"]["status"] == "failed" and retry_interval > 0:
+            socketio.sleep(retry_interval)
+            _run_phase("executor", _warm_executor)
+    else:
+        startup_state["executor"].update(status="done", detail="skipped")
+    logger.info("startup warm-up finished: %s",
+                {phase: state["status"] for phase, state in startup_state.items()})
+
+def start_warmup(app):
+    """Starts the warm-up once per process; /readyz reports ready when it has finished."""
+    global _warmup_started
+    if _warmup_started:
+        return
+    _warmup_started = True
+    socketio.start_background_task(run_warmup, app)
+
+def _database_ok():
+    try:
+        db.session.execute(text("SELECT 1"))
+        return True, None
+    except Exception as e:
+        db.session.rollback()
+        return False, str(e)
+
+@bp.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness only: the process is up and serving requests
+    return jsonify({"status": "ok"}), 200
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Ready once the database answers and the warm-up has finished. The executor
+    phase is only required when READY_REQUIRES_EXECUTOR is set.
+    """
+    database_ok, database_error = _database_ok()
+    required = ["catalog"]
+    if current_app.config.get('READY_REQUIRES_EXECUTOR', True):
+        required.append("executor")
+    ready = database_ok and all(startup_state[phase]["status"] == "done" for phase in required)
+    return jsonify({
+        "status": "ready" if ready else "starting",
+        "database": "ok" if database_ok else database_error,
+        "phases": startup_state,
+    }), 200 if ready else 503
@@ -0,0 +1,141 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+# Logger used by request handlers; records go through a queue so handlers never block on stdout
+logger = logging.getLogger('codecollab')
+
+# Set by init_app(); spans are no-ops until tracing is enabled
+enabled = False
+sample_rates = {}
+default_sample_rate = 1.0
+
+_listener = None
+# Span of the handler call running on this thread/greenlet
+_local = threading.local()
+
+def parse_sample_rates(value):
+    """Parses "code_change=0.01,cursor_move=0" into {"code_change": 0.01, "cursor_move": 0.0}."""
+    rates = {}
+    for item in (value or "").split(","):
+        name, sep, rate = item.partition("=")
+        if sep and name.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+def _format_fields(fields):
+    parts = []
+    for key, value in fields.items():
+        if value is None:
+            continue
+        text = str(value)
+        if " " in text or '"' in text:
+            text = '"' + text.replace('"', '\\"') + '"'
+        parts.append(f"{key}={text}")
+    return " ".join(parts)
+
+class Span:
+    """A sampled trace span. Fields given at start are attached to every line it logs."""
+
+    enabled = True
+
+    def __init__(self, event, fields):
+        self.event = event
+        self.fields = fields
+        self.span_id = uuid.uuid4().hex[:8]
+        self.start = time.perf_counter()
+
+    def log(self, message, **fields):
+        logger.debug("%s", _format_fields({"event": self.event, "span": self.span_id, **self.fields,
+                                           **fields, "msg": message}))
+
+    def annotate(self, **fields):
+        """Adds fields to every line the span logs from now on, including its "done" line."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'span', NULL_SPAN)
+        _local.span = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.span = self.previous
+        duration_ms = round((time.perf_counter() - self.start) * 1000, 3)
+        self.log("error" if exc_type else "done", duration_ms=duration_ms,
+                 error=repr(exc) if exc_type else None)
+        return False
+
+class _NullSpan:
+    """Returned when the event is not traced; every call is a no-op."""
+
+    enabled = False
+
+    def log(self, message, **fields):
+        pass
+
+    def annotate(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+def span(event, **fields):
+    """
+    Starts a span for a Socket.IO event if tracing is on and the event is sampled.
+    Callers should guard debug-only work with `if span.enabled:`.
+    """
+    if not enabled:
+        return NULL_SPAN
+    rate = sample_rates.get(event, default_sample_rate)
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return NULL_SPAN
+    return Span(event, fields)
+
+def event_span(event, data):
+    """Span for one Socket.IO handler call, tagged with the room and user from its payload."""
+    if not enabled:
+        return NULL_SPAN
+    if isinstance(data, dict):
+        return span(event, room=data.get('room_id'), user=data.get('username'))
+    return span(event)
+
+def current_span():
+    """The span opened by track_event for the running handler, or NULL_SPAN if it isn't traced."""
+    return getattr(_local, 'span', NULL_SPAN)
+
+def _stop_listener():
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+def init_app(app):
+    """Configures the queue-backed log handler and tracing settings from the app config."""
+    global enabled, sample_rates, default_sample_rate, _listener
+    level = getattr(logging, str(app.config.get('LOG_LEVEL', 'INFO')).upper(), logging.INFO)
+    sample_rates = parse_sample_rates(app.config.get('TRACE_SAMPLE_RATES'))
+    default_sample_rate = float(app.config.get('TRACE_DEFAULT_SAMPLE_RATE', 1.0))
+
+    if _listener is None:
+        log_queue = queue.SimpleQueue()
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        logger.propagate = False
+    logger.setLevel(level)
+    # Spans log at DEBUG, so a higher LOG_LEVEL turns tracing off as well
+    enabled = bool(app.config.get('TRACE_ENABLED')) and logger.isEnabledFor(logging.DEBUG)
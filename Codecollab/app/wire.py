@@ -0,0 +1,97 @@
+import json
+import zlib
+from flask import current_app
+from app import socketio
+from app.metrics import emit_size
+
+# Events whose payload can grow with the document or the room size
+PACKED_EVENTS = {'code_update', 'problem_loaded', 'presence_snapshot', 'room_bootstrap'}
+
+# Negotiated wire format per socket id, e.g. {'sid1': 'json+deflate'}
+# Clients that never negotiate keep receiving plain JSON events
+client_formats = {}
+
+def supported_encodings():
+    return ['json']
+
+def negotiate(sid, options):
+    """
+    Picks a wire format from the client's advertised capabilities, e.g.
+    {"encodings": ["json"], "compression": ["deflate"]}.
+    Returns the chosen format name or None when the client should stay on plain JSON.
+    """
+    if not isinstance(options, dict):
+        return None
+    encodings = options.get('encodings') or []
+    compression = options.get('compression') or []
+    encoding = next((e for e in supported_encodings() if e in encodings), None)
+    if not encoding:
+        return None
+    fmt = f"{encoding}+deflate" if 'deflate' in compression else encoding
+    # Uncompressed JSON is what plain clients already get
+    if fmt == 'json':
+        return None
+    client_formats[sid] = fmt
+    return fmt
+
+def format_room(room_id, fmt):
+    return f"{room_id}#{fmt}"
+
+def forget(sid):
+    client_formats.pop(sid, None)
+
+def encode(payload, fmt, json_bytes=None, level=6):
+    """Encodes a payload for a negotiated format. Returns (envelope, encoded_size)."""
+    encoding, _, compression = fmt.partition('+')
+    body = json_bytes if json_bytes is not None else json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    if compression == 'deflate':
+        body = zlib.compress(body, level)
+    return {'encoding': encoding, 'compression': compression or None, 'data': body}, len(body)
+
+def _participants(room):
+    try:
+        return [sid for sid, _ in socketio.server.manager.get_participants('/', room)]
+    except (KeyError, AttributeError):
+        return []
+
+def broadcast(event, payload, room_id, skip_sid=None):
+    """
+    Emits an event to a room, sending packed binary frames to clients that negotiated
+    a wire format and plain JSON to everyone else. Payloads below the size threshold
+    are always sent as plain JSON so small updates pay no encoding cost.
+    """
+    threshold = current_app.config.get('WIRE_COMPRESSION_THRESHOLD', 4096)
+    level = current_app.config.get('WIRE_COMPRESSION_LEVEL', 6)
+    packed_rooms = []
+    if client_formats and event in PACKED_EVENTS:
+        for fmt in set(client_formats.values()):
+            sids = [sid for sid in _participants(format_room(room_id, fmt)) if sid != skip_sid]
+            if sids:
+                packed_rooms.append((fmt, sids))
+
+    if packed_rooms:
+        json_bytes = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        if len(json_bytes) >= threshold:
+            packed_sids = []
+            for fmt, sids in packed_rooms:
+                envelope, size = encode(payload, fmt, json_bytes, level)
+                with emit_size(size):
+                    socketio.emit(event, envelope, to=format_room(room_id, fmt), skip_sid=skip_sid)
+                packed_sids.extend(sids)
+            skip = packed_sids + ([skip_sid] if skip_sid else [])
+            with emit_size(len(json_bytes)):
+                socketio.emit(event, payload, to=room_id, skip_sid=skip)
+            return
+    socketio.emit(event, payload, to=room_id, skip_sid=skip_sid)
+
+def send(event, payload, sid):
+    """Emits an event to a single client, packed if it negotiated a format and the payload is large."""
+    fmt = client_formats.get(sid)
+    if fmt and event in PACKED_EVENTS:
+        json_bytes = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        if len(json_bytes) >= current_app.config.get('WIRE_COMPRESSION_THRESHOLD', 4096):
+            envelope, size = encode(payload, fmt, json_bytes, current_app.config.get('WIRE_COMPRESSION_LEVEL', 6))
+            with emit_size(size):
+                socketio.emit(event, envelope, to=sid)
+            return
+    socketio.emit(event, payload, to=sid)
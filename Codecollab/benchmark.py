@@ -0,0 +1,366 @@
+"""
+Load generator and latency benchmark for the Socket.IO handlers.
+
+Simulates N rooms x M clients emitting code_change, cursor_move, typing,
+execute_code and submit_code at configurable rates against a throwaway
+SQLite database (or any DATABASE_URL passed with --database-url), with the
+Docker executor replaced by a mock. Writes a JSON report that can be
+compared against a previous run with --compare.
+
+    python benchmark.py --rooms 20 --clients 4 --duration 30 --output bench.json
+    python benchmark.py --compare bench.json
+    python benchmark.py --wire-sizes 1000,100000,1000000
+"""
+import argparse
+import heapq
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from sqlalchemy import event as sa_event, inspect
+from config import Config
+from app import create_app, db, socketio
+from app.models import Room, Problem, TestCase
+import app.api_routes as api_routes
+from app.code_executor import StreamedRun
+from app import wire
+
+DEFAULT_RATES = "code_change=5,cursor_move=10,typing=2,execute_code=0.05,submit_code=0.02"
+
+def parse_rates(value):
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    unknown = set(rates) - set(EVENT_BUILDERS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown events: {', '.join(sorted(unknown))}")
+    return rates
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def make_document(size, seed):
+    rng = random.Random(seed)
+    line = "def solve(nums):\n    return sum(x * x for x in nums)  # {}\n"
+    doc = []
+    total = 0
+    while total < size:
+        chunk = line.format(rng.randint(0, 10 ** 6))
+        doc.append(chunk)
+        total += len(chunk)
+    return "".join(doc)[:size]
+
+def mock_run_code(delay_ms):
+    def run_code(user_code, language, test_input_args=""):
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+        return "42", ""
+    return run_code
+
+class _MockRun(StreamedRun):
+    def __init__(self, output):
+        super().__init__()
+        self.output = output
+
+    def stdout(self):
+        yield self.output.encode("utf-8")
+
+def mock_stream_code(delay_ms):
+    run_code = mock_run_code(delay_ms)
+
+    @contextmanager
+    def stream_code(user_code, language, test_input_args="", input_path=None):
+        output, error = run_code(user_code, language, test_input_args)
+        yield StreamedRun(error=error) if error else _MockRun(output)
+    return stream_code
+
+# Each builder returns the payload a client would send for that event
+EVENT_BUILDERS = {
+    "code_change": lambda ctx: {"room_id": ctx["room_id"], "code_content": ctx["doc"] + str(ctx["seq"]), "message_id": f"{ctx['username']}-{ctx['seq']}"},
+    "cursor_move": lambda ctx: {"room_id": ctx["room_id"], "username": ctx["username"], "line": ctx["seq"] % 200 + 1, "column": ctx["seq"] % 40 + 1},
+    "typing": lambda ctx: {"room_id": ctx["room_id"], "username": ctx["username"], "is_typing": ctx["seq"] % 2 == 0},
+    "execute_code": lambda ctx: {"room_id": ctx["room_id"], "language": "python", "code": "print(42)"},
+    "submit_code": lambda ctx: {"room_id": ctx["room_id"], "language": "python", "code": "def solve(n):\n    return 42"},
+}
+
+class QueryCounter:
+    """Counts SQL statements and commits issued through the engine."""
+
+    def __init__(self, engine):
+        self.queries = 0
+        self.commits = 0
+        sa_event.listen(engine, "before_cursor_execute", self._on_execute)
+        sa_event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args, **kwargs):
+        self.queries += 1
+
+    def _on_commit(self, *args, **kwargs):
+        self.commits += 1
+
+def setup_rooms(args):
+    problem = Problem()
+    problem.title = "Benchmark"
+    problem.description = "Synthetic problem used by benchmark.py"
+    problem.template_code = "def solve(n):\n    pass"
+    for _ in range(args.test_cases):
+        tc = TestCase(); tc.input_data = "1"; tc.expected_output = "42"; problem.test_cases.append(tc)
+    db.session.add(problem)
+    db.session.flush()
+    room_ids = [f"bench{i:04d}" for i in range(args.rooms)]
+    for room_id in room_ids:
+        room = Room()
+        room.id = room_id
+        room.code_content = ""
+        room.problem_id = problem.id
+        db.session.add(room)
+    db.session.commit()
+    return room_ids
+
+def run_benchmark(args):
+    db_path = None
+    database_url = args.database_url
+    if not database_url:
+        fd, db_path = tempfile.mkstemp(suffix=".db", prefix="codecollab-bench-")
+        os.close(fd)
+        database_url = f"sqlite:///{db_path}"
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        TESTING = True
+
+    app = create_app(BenchConfig)
+    api_routes.run_code = mock_run_code(args.executor_delay_ms)
+    api_routes.stream_code = mock_stream_code(args.executor_delay_ms)
+    try:
+        with app.app_context():
+            if db_path is None and inspect(db.engine).get_table_names():
+                if not args.drop_existing:
+                    sys.exit(f"{database_url} already has tables; pass --drop-existing to wipe them for the benchmark")
+                db.drop_all()
+            db.create_all()
+            room_ids = setup_rooms(args)
+            doc = make_document(args.doc_size, args.seed)
+
+            clients = []
+            for room_id in room_ids:
+                for c in range(args.clients):
+                    client = socketio.test_client(app)
+                    username = f"user{c}"
+                    client.emit("join_room", {"room_id": room_id, "username": username})
+                    clients.append({"client": client, "room_id": room_id, "username": username, "seq": 0})
+            for c in clients:
+                c["client"].get_received()
+
+            counter = QueryCounter(db.engine)
+            rng = random.Random(args.seed)
+            # Schedule each client's events as independent Poisson processes
+            schedule = []
+            for i, c in enumerate(clients):
+                for name, rate in args.rates.items():
+                    if rate > 0:
+                        heapq.heappush(schedule, (rng.expovariate(rate), i, name))
+
+            service = {name: [] for name in args.rates}
+            latency = {name: [] for name in args.rates}
+            received = 0
+            received_bytes = 0
+            start = time.perf_counter()
+            while schedule:
+                due, i, name = heapq.heappop(schedule)
+                if due > args.duration:
+                    break
+                now = time.perf_counter() - start
+                if due > now:
+                    time.sleep(due - now)
+                c = clients[i]
+                c["seq"] += 1
+                payload = EVENT_BUILDERS[name]({**c, "doc": doc})
+                t0 = time.perf_counter()
+                c["client"].emit(name, payload)
+                t1 = time.perf_counter()
+                service[name].append((t1 - t0) * 1000)
+                # Latency counts from the scheduled send time, so server backlog is not hidden
+                latency[name].append((t1 - start - due) * 1000)
+                for peer in clients:
+                    if peer["room_id"] == c["room_id"]:
+                        for message in peer["client"].get_received():
+                            received += 1
+                            received_bytes += len(json.dumps(message.get("args"), default=str))
+                heapq.heappush(schedule, (due + rng.expovariate(args.rates[name]), i, name))
+            elapsed = time.perf_counter() - start
+
+            for c in clients:
+                c["client"].disconnect()
+            dialect = db.engine.dialect.name
+    finally:
+        if db_path and os.path.exists(db_path):
+            os.remove(db_path)
+
+    total_events = sum(len(v) for v in service.values())
+    per_event = {}
+    for name in args.rates:
+        samples = latency[name]
+        per_event[name] = {
+            "count": len(samples),
+            "service_mean_ms": statistics.fmean(service[name]) if service[name] else None,
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+            "p99_ms": percentile(samples, 99),
+            "max_ms": max(samples) if samples else None,
+        }
+    return {
+        "config": {
+            "rooms": args.rooms,
+            "clients_per_room": args.clients,
+            "duration_s": args.duration,
+            "rates_per_client": args.rates,
+            "doc_size": args.doc_size,
+            "executor_delay_ms": args.executor_delay_ms,
+            "test_cases": args.test_cases,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": dialect,
+        },
+        "totals": {
+            "events": total_events,
+            "elapsed_s": elapsed,
+            "throughput_eps": total_events / elapsed if elapsed else 0.0,
+            "messages_received": received,
+            "bytes_received": received_bytes,
+        },
+        "db": {
+            "queries": counter.queries,
+            "commits": counter.commits,
+            "queries_per_event": counter.queries / total_events if total_events else 0.0,
+            "commits_per_event": counter.commits / total_events if total_events else 0.0,
+        },
+        "events": per_event,
+    }
+
+def compare_reports(baseline, current, threshold):
+    """Prints deltas against a baseline report and returns True if anything regressed past threshold percent."""
+    regressed = False
+
+    def line(label, old, new, higher_is_worse=True):
+        nonlocal regressed
+        if old in (None, 0) or new is None:
+            print(f"  {label:<28} {old!s:>12} -> {new!s:>12}")
+            return
+        change = (new - old) / old * 100
+        worse = change > threshold if higher_is_worse else change < -threshold
+        regressed = regressed or worse
+        flag = "  REGRESSION" if worse else ""
+        print(f"  {label:<28} {old:>12.3f} -> {new:>12.3f} ({change:+.1f}%){flag}")
+
+    print("Comparison against baseline:")
+    line("throughput_eps", baseline["totals"]["throughput_eps"], current["totals"]["throughput_eps"], higher_is_worse=False)
+    line("queries_per_event", baseline["db"]["queries_per_event"], current["db"]["queries_per_event"])
+    line("commits_per_event", baseline["db"]["commits_per_event"], current["db"]["commits_per_event"])
+    for name, stats in current["events"].items():
+        old = baseline["events"].get(name, {})
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            line(f"{name}.{key}", old.get(key), stats[key])
+    return regressed
+
+def wire_report(sizes, repeat, seed, level):
+    """Measures payload bytes and encode CPU time per broadcast for each wire format."""
+    formats = ["json", "json+deflate"]
+    results = []
+    for size in sizes:
+        payload = {"code_content": make_document(size, seed), "message_id": "bench-1"}
+        for fmt in formats:
+            start = time.process_time()
+            for _ in range(repeat):
+                if fmt == "json":
+                    encoded = len(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+                else:
+                    _, encoded = wire.encode(payload, fmt, level=level)
+            cpu_us = (time.process_time() - start) / repeat * 1e6
+            results.append({"doc_size": size, "format": fmt, "bytes": encoded, "encode_cpu_us": cpu_us})
+    return results
+
+def print_wire_report(results):
+    print(f"{'doc size':>10}  {'format':<16}{'bytes':>12}{'ratio':>8}{'cpu us':>12}")
+    baseline = {}
+    for row in results:
+        if row["format"] == "json":
+            baseline[row["doc_size"]] = row["bytes"]
+        ratio = row["bytes"] / baseline[row["doc_size"]] if baseline.get(row["doc_size"]) else 1.0
+        print(f"{row['doc_size']:>10}  {row['format']:<16}{row['bytes']:>12}{ratio:>8.2f}{row['encode_cpu_us']:>12.1f}")
+
+def print_report(report):
+    totals = report["totals"]
+    print(f"Database: {report['environment']['database']}  "
+          f"rooms={report['config']['rooms']} clients/room={report['config']['clients_per_room']}")
+    print(f"Events: {totals['events']} in {totals['elapsed_s']:.2f}s "
+          f"({totals['throughput_eps']:.1f} events/s), {totals['messages_received']} messages received")
+    print(f"DB: {report['db']['queries']} queries ({report['db']['queries_per_event']:.2f}/event), "
+          f"{report['db']['commits']} commits ({report['db']['commits_per_event']:.2f}/event)")
+    print(f"{'event':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in report["events"].items():
+        if not stats["count"]:
+            continue
+        print(f"{name:<14}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CodeCollab Socket.IO handlers.")
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=3, help="Clients per room")
+    parser.add_argument("--duration", type=float, default=10.0, help="Simulated seconds of traffic")
+    parser.add_argument("--rates", type=parse_rates, default=DEFAULT_RATES,
+                        help=f"Events per second per client (default: {DEFAULT_RATES})")
+    parser.add_argument("--doc-size", type=int, default=2000, help="Characters per code_change payload")
+    parser.add_argument("--executor-delay-ms", type=float, default=50.0, help="Simulated executor run time")
+    parser.add_argument("--test-cases", type=int, default=3, help="Test cases on the benchmark problem")
+    parser.add_argument("--database-url", default=None,
+                        help="Database to benchmark against, e.g. a scratch Postgres (default: temporary SQLite file)")
+    parser.add_argument("--drop-existing", action="store_true",
+                        help="Drop all tables of --database-url first (refuses to run on a non-empty schema otherwise)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument("--wire-sizes", help="Only benchmark wire encodings at these comma-separated document sizes")
+    parser.add_argument("--wire-repeat", type=int, default=50, help="Encodings per size and format")
+    args = parser.parse_args()
+    if isinstance(args.rates, str):
+        args.rates = parse_rates(args.rates)
+
+    if args.wire_sizes:
+        sizes = [int(size) for size in args.wire_sizes.split(",")]
+        results = wire_report(sizes, args.wire_repeat, args.seed, Config.WIRE_COMPRESSION_LEVEL)
+        print_wire_report(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"wire": results}, f, indent=2)
+        return
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare_reports(baseline, report, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import argparse
+from app import create_app
+from app.session_archive import run_retention
+
+# Create a Flask app instance to work with the database
+app = create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact and archive old session events.")
+    parser.add_argument("--compact-after-days", type=int, default=None,
+                        help="Collapse code_change runs older than this (default: SESSION_COMPACT_AFTER_DAYS)")
+    parser.add_argument("--archive-after-days", type=int, default=None,
+                        help="Archive rooms idle for longer than this (default: SESSION_ARCHIVE_AFTER_DAYS)")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of rooms to process per phase")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+
+    with app.app_context():
+        stats = run_retention(
+            compact_after_days=args.compact_after_days,
+            archive_after_days=args.archive_after_days,
+            dry_run=args.dry_run,
+            limit=args.limit,
+        )
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"{prefix}Compacted {stats['events_compacted']} events in {stats['rooms_compacted']} rooms")
+    print(f"{prefix}Archived {stats['events_archived']} events from {stats['rooms_archived']} rooms")
+
+if __name__ == "__main__":
+    main()
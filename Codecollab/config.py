@@ -39,7 +39,81 @@ class Config:
     SQLALCHEMY_DATABASE_URI = DATABASE_URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    # Connection Pool Settings
+    # Connection Pool Settings (applied as engine options by app/database.py)
     SQLALCHEMY_POOL_RECYCLE = 280
     SQLALCHEMY_POOL_TIMEOUT = 20
     SQLALCHEMY_POOL_PRE_PING = True
+
+    # Optional read replica for read-only GET endpoints
+    READ_DATABASE_URL = os.environ.get('READ_DATABASE_URL')
+    if READ_DATABASE_URL and READ_DATABASE_URL.startswith("postgres://"):
+        READ_DATABASE_URL = READ_DATABASE_URL.replace("postgres://", "postgresql://")
+    if READ_DATABASE_URL and "sslmode" not in READ_DATABASE_URL and READ_DATABASE_URL.startswith("postgresql://"):
+        READ_DATABASE_URL += "?sslmode=require"
+    # Rooms written within this many seconds are read from the primary (read-your-writes)
+    REPLICA_LAG_WINDOW = float(os.environ.get('REPLICA_LAG_WINDOW', 5))
+
+    # Single-node SQLite profile: WAL, synchronous=NORMAL, busy timeout, pooled connections
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'true').lower() in ('1', 'true', 'yes')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 10))
+    SQLITE_POOL_OVERFLOW = int(os.environ.get('SQLITE_POOL_OVERFLOW', 10))
+
+    # Presence reaper: drop UserPresence rows whose heartbeat is older than the TTL
+    PRESENCE_TTL_SECONDS = int(os.environ.get('PRESENCE_TTL_SECONDS', 120))
+    PRESENCE_REAP_INTERVAL = int(os.environ.get('PRESENCE_REAP_INTERVAL', 30))
+    PRESENCE_REAP_BATCH_SIZE = int(os.environ.get('PRESENCE_REAP_BATCH_SIZE', 500))
+
+    # Session retention: compact old code_change runs, archive closed sessions to gzip NDJSON
+    SESSION_COMPACT_AFTER_DAYS = int(os.environ.get('SESSION_COMPACT_AFTER_DAYS', 1))
+    SESSION_ARCHIVE_AFTER_DAYS = int(os.environ.get('SESSION_ARCHIVE_AFTER_DAYS', 30))
+    SESSION_ARCHIVE_DIR = os.environ.get('SESSION_ARCHIVE_DIR')
+
+    # Prometheus metrics on /metrics (instrumentation is skipped entirely when off)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    # Emits whose payload was not already encoded are sized one in every N per event
+    METRICS_EMIT_SAMPLE = int(os.environ.get('METRICS_EMIT_SAMPLE', 10))
+
+    # Tracing: sampled per-event spans logged at DEBUG through a non-blocking queue handler
+    TRACE_ENABLED = os.environ.get('TRACE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    TRACE_SAMPLE_RATES = os.environ.get('TRACE_SAMPLE_RATES', 'code_change=0.05,cursor_move=0.01,selection_change=0.01,typing=0.01')
+    TRACE_DEFAULT_SAMPLE_RATE = float(os.environ.get('TRACE_DEFAULT_SAMPLE_RATE', 1.0))
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG' if TRACE_ENABLED else 'INFO')
+
+    # Wire format: negotiated clients get large payloads as compressed binary frames
+    WIRE_COMPRESSION_THRESHOLD = int(os.environ.get('WIRE_COMPRESSION_THRESHOLD', 4096))
+    WIRE_COMPRESSION_LEVEL = int(os.environ.get('WIRE_COMPRESSION_LEVEL', 6))
+
+    # Documents at or above this size are stored as content-addressed chunks instead of inline text
+    DOCUMENT_CHUNK_THRESHOLD = int(os.environ.get('DOCUMENT_CHUNK_THRESHOLD', 256 * 1024))
+    DOCUMENT_CACHE_SIZE = int(os.environ.get('DOCUMENT_CACHE_SIZE', 256))
+
+    # Cached problem catalog: seconds between checks for problems written by other processes
+    CATALOG_CHECK_INTERVAL = float(os.environ.get('CATALOG_CHECK_INTERVAL', 2))
+
+    # Problem import: test files above the inline limit go to the content-addressed blob store
+    BLOB_STORE_DIR = os.environ.get('BLOB_STORE_DIR')
+    TESTCASE_INLINE_LIMIT = int(os.environ.get('TESTCASE_INLINE_LIMIT', 4096))
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', 512 * 1024 * 1024))
+
+    # Extra modules that register custom output checkers (comma-separated, e.g. "checkers_local")
+    CHECKER_MODULES = os.environ.get('CHECKER_MODULES', '')
+
+    # Room hibernation: rooms nobody has touched for ROOM_IDLE_SECONDS move to compressed cold
+    # storage; ROOM_HOT_LIMIT (0 = no cap) also hibernates the least recently active rooms
+    ROOM_IDLE_SECONDS = int(os.environ.get('ROOM_IDLE_SECONDS', 3 * 24 * 3600))
+    ROOM_HOT_LIMIT = int(os.environ.get('ROOM_HOT_LIMIT', 0))
+    ROOM_HIBERNATE_INTERVAL = int(os.environ.get('ROOM_HIBERNATE_INTERVAL', 300))
+    ROOM_HIBERNATE_BATCH_SIZE = int(os.environ.get('ROOM_HIBERNATE_BATCH_SIZE', 200))
+
+    # Startup warm-up: pre-pull/warm sandbox images in the background; /readyz waits for it
+    STARTUP_WARM_EXECUTOR = os.environ.get('STARTUP_WARM_EXECUTOR', 'true').lower() in ('1', 'true', 'yes')
+    STARTUP_RETRY_INTERVAL = int(os.environ.get('STARTUP_RETRY_INTERVAL', 30))
+    READY_REQUIRES_EXECUTOR = os.environ.get('READY_REQUIRES_EXECUTOR', 'true').lower() in ('1', 'true', 'yes')
+
+    # Admin endpoints (problem import, profiling) are limited to these comma-separated user ids
+    ADMIN_USER_IDS = os.environ.get('ADMIN_USER_IDS', '')
+    PROFILING_MAX_SECONDS = int(os.environ.get('PROFILING_MAX_SECONDS', 300))
+    PROFILING_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILING_SAMPLE_INTERVAL_MS', 1))
+    PROFILING_KEEP_SESSIONS = int(os.environ.get('PROFILING_KEEP_SESSIONS', 20))
@@ -1,25 +1,88 @@
 import os
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+# Columns added after the first release, as (table, column, PostgreSQL definition, SQLite definition).
+# SQLite can't add a column with a non-constant default, so its timestamps are backfilled instead.
+COLUMNS = [
+    ("room", "language", "VARCHAR(20) NOT NULL DEFAULT 'python'", "VARCHAR(20) NOT NULL DEFAULT 'python'"),
+    ("room", "revision", "INTEGER NOT NULL DEFAULT 0", "INTEGER NOT NULL DEFAULT 0"),
+    ("test_case", "input_blob", "VARCHAR(64)", "VARCHAR(64)"),
+    ("test_case", "output_blob", "VARCHAR(64)", "VARCHAR(64)"),
+    ("problem", "checker", "VARCHAR(50) NOT NULL DEFAULT 'whitespace'", "VARCHAR(50) NOT NULL DEFAULT 'whitespace'"),
+    ("problem", "checker_options", "JSON", "JSON"),
+    ("problem", "updated_at", "TIMESTAMPTZ DEFAULT now()", "DATETIME"),
+    ("room", "last_active_at", "TIMESTAMPTZ DEFAULT now()", "DATETIME"),
+    ("room", "hibernated", "BOOLEAN NOT NULL DEFAULT false", "BOOLEAN NOT NULL DEFAULT 0"),
+]
+SQLITE_BACKFILL = {("problem", "updated_at"), ("room", "last_active_at")}
+
+INDEXES = [
+    ("user_presence", "CREATE INDEX IF NOT EXISTS ix_user_presence_last_seen ON user_presence (last_seen)"),
+    ("room", "CREATE INDEX IF NOT EXISTS idx_room_hot_activity ON room (hibernated, last_active_at)"),
+]
 
 
 def get_database_uri() -> str:
     env_url = os.environ.get("DATABASE_URL")
     if env_url:
-        return env_url
-    # Fallback to Config in this folder without importing the Flask app
-    from config import Config  # safe import
-    return Config.SQLALCHEMY_DATABASE_URI
+        uri = env_url
+    else:
+        # Fallback to Config in this folder without importing the Flask app
+        from config import Config  # safe import
+        uri = Config.SQLALCHEMY_DATABASE_URI
+    url = make_url(uri)
+    # Flask-SQLAlchemy resolves relative SQLite paths against the instance folder; do the same
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:" \
+            and not os.path.isabs(url.database):
+        instance = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance")
+        uri = url.set(database=os.path.join(instance, url.database)).render_as_string(hide_password=False)
+    return uri
+
+
+def _sqlite_columns(connection, table):
+    return {row[1]: row for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+
 
+def _upgrade_sqlite(connection):
+    presence = _sqlite_columns(connection, "user_presence")
+    # SQLite can't drop NOT NULL in place; tables created by this app's models are already nullable
+    if presence and presence["user_id"][3]:
+        print("WARNING: user_presence.user_id is NOT NULL; recreate the table to allow guest presence")
+    for table, column, _, definition in COLUMNS:
+        existing = _sqlite_columns(connection, table)
+        # Missing tables are created in full by db.create_all() on startup
+        if existing and column not in existing:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            if (table, column) in SQLITE_BACKFILL:
+                connection.execute(text(f"UPDATE {table} SET {column} = CURRENT_TIMESTAMP WHERE {column} IS NULL"))
+    for table, statement in INDEXES:
+        if _sqlite_columns(connection, table):
+            connection.execute(text(statement))
 
-def main() -> None:
-    uri = get_database_uri()
-    engine = create_engine(uri)
+
+def _upgrade_postgres(connection):
+    connection.execute(text("ALTER TABLE user_presence ALTER COLUMN user_id DROP NOT NULL"))
+    for table, column, definition, _ in COLUMNS:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}"))
+    for _, statement in INDEXES:
+        connection.execute(text(statement))
+
+
+def main(uri=None) -> None:
+    engine = create_engine(uri or get_database_uri())
     with engine.begin() as connection:
-        connection.execute(text("ALTER TABLE user_presence ALTER COLUMN user_id DROP NOT NULL"))
+        if engine.dialect.name == "sqlite":
+            _upgrade_sqlite(connection)
+        else:
+            _upgrade_postgres(connection)
     print("OK: user_presence.user_id is now NULLABLE")
+    print("OK: user_presence.last_seen is indexed")
+    print("OK: room.language / revision exist")
+    print("OK: test_case.input_blob / output_blob exist")
+    print("OK: problem.checker / checker_options / updated_at exist")
+    print("OK: room.last_active_at / hibernated exist and are indexed")
 
 
 if __name__ == "__main__":
     main()
-
-
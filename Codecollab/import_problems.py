@@ -0,0 +1,33 @@
+import argparse
+import sys
+from app import create_app
+from app.problem_import import import_package, PackageError
+
+# Create a Flask app instance to work with the database
+app = create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import problem packages (tar archives, optionally compressed).")
+    parser.add_argument("archives", nargs="+", help="Package archives to import, or - to read one from stdin")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Test cases per bulk insert (default: IMPORT_BATCH_SIZE)")
+    args = parser.parse_args()
+
+    with app.app_context():
+        for path in args.archives:
+            try:
+                if path == "-":
+                    stats = import_package(sys.stdin.buffer, batch_size=args.batch_size)
+                else:
+                    with open(path, "rb") as f:
+                        stats = import_package(f, batch_size=args.batch_size)
+            except PackageError as e:
+                print(f"{path}: {e}")
+                sys.exit(1)
+            print(f"{path}: {stats['problems_created']} problems created, {stats['problems_replaced']} replaced, "
+                  f"{stats['test_cases']} test cases")
+            print(f"{path}: {stats['blobs_written']} blobs written ({stats['blob_bytes']} bytes), "
+                  f"{stats['blobs_reused']} already stored, {stats['blobs_removed']} no longer used removed")
+
+if __name__ == "__main__":
+    main()
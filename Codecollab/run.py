@@ -1,10 +1,16 @@
 from app import create_app, db, socketio
+from app.presence_reaper import start_presence_reaper
+from app.room_lifecycle import start_room_hibernator
+from app.startup import start_warmup
 from app.models import User, Room, SessionEvent, UserPresence
 from flask import jsonify
 from flask_cors import CORS
 import os
 
 app = create_app()
+start_presence_reaper(app)
+start_room_hibernator(app)
+start_warmup(app)
 
 CORS(app, origins=[
     "https://code-collab-project.vercel.app",
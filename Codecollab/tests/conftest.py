@@ -0,0 +1,50 @@
+import os
+import sys
+import pytest
+
+# Lets the tests import the app package when pytest is started from outside Codecollab/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Builds an app on a SQLite file (a throwaway one by default) and resets per-process caches afterwards."""
+    from config import Config
+    from app import create_app, catalog, documents
+    from app import api_routes
+
+    def make(database_uri=None, **overrides):
+        class TestConfig(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = database_uri or f"sqlite:///{tmp_path / 'test.db'}"
+            SQLALCHEMY_BINDS = {}
+            BLOB_STORE_DIR = str(tmp_path / 'blobs')
+            SESSION_ARCHIVE_DIR = str(tmp_path / 'archive')
+            METRICS_ENABLED = False
+            TRACE_ENABLED = False
+            CATALOG_CHECK_INTERVAL = 0
+            ADMIN_USER_IDS = '1'
+        for key, value in overrides.items():
+            setattr(TestConfig, key, value)
+        return create_app(TestConfig)
+
+    yield make
+    catalog.invalidate_catalog()
+    catalog._fingerprint = None
+    documents._documents.clear()
+    documents._persisted.clear()
+    api_routes.active_users.clear()
+    api_routes.socket_sessions.clear()
+
+@pytest.fixture
+def app(make_app):
+    from app import db
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,45 @@
+import sqlite3
+from app import db
+from app.models import Problem
+from app.catalog import get_problem_details, get_problem_list, warm_catalog
+
+def add_problem(title, template_code=None):
+    problem = Problem(title=title, description="d", template_code=template_code)
+    db.session.add(problem)
+    db.session.commit()
+    return problem
+
+def test_warm_catalog_serves_from_cache(app):
+    add_problem("A", "old")
+    assert warm_catalog() == 1
+    assert get_problem_list() == [{"id": 1, "title": "A"}]
+    assert get_problem_details(1)["template_code"] == "old"
+    assert get_problem_details(99) is None
+
+def test_writes_from_another_process_are_picked_up(app):
+    add_problem("A", "old")
+    warm_catalog()
+    # e.g. seed.py or import_problems.py running next to the server
+    other = sqlite3.connect(app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):])
+    other.execute("UPDATE problem SET template_code = 'new', updated_at = '2099-01-01 00:00:00' WHERE id = 1")
+    other.execute("INSERT INTO problem (title, description, checker) VALUES ('B', 'd', 'whitespace')")
+    other.commit()
+    other.close()
+    db.session.commit()
+    assert [p["title"] for p in get_problem_list()] == ["A", "B"]
+    assert get_problem_details(1)["template_code"] == "new"
+
+def test_orm_updates_bump_the_fingerprint(app):
+    problem = add_problem("A", "old")
+    warm_catalog()
+    problem.template_code = "new"
+    db.session.commit()
+    assert get_problem_details(1)["template_code"] == "new"
+
+def test_check_interval_limits_queries(app):
+    app.config['CATALOG_CHECK_INTERVAL'] = 3600
+    add_problem("A")
+    warm_catalog()
+    add_problem("B")
+    # Still inside the interval: the cached list is served
+    assert [p["title"] for p in get_problem_list()] == ["A"]
@@ -0,0 +1,62 @@
+import pytest
+from app.checkers import CHECKERS, iter_lines, iter_tokens
+
+def split_every(data, size):
+    """Cuts data into chunks of size bytes, so tokens and lines straddle chunk boundaries."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def check(name, expected, actual, options=None, size=3):
+    return CHECKERS[name](iter(split_every(expected, size)), iter(split_every(actual, size)), options or {})
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 100])
+def test_tokens_across_chunk_boundaries(size):
+    data = b"  12 345\n\n6789   abc\tdef  \n"
+    assert list(iter_tokens(split_every(data, size))) == [b"12", b"345", b"6789", b"abc", b"def"]
+
+def test_tokens_without_trailing_whitespace():
+    assert list(iter_tokens([b"1 2", b"3"])) == [b"1", b"23"]
+    assert list(iter_tokens([b"", b"  ", b""])) == []
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 100])
+def test_lines_across_chunk_boundaries(size):
+    data = b"first\r\n\nthird line\nlast\n\n\n"
+    assert list(iter_lines(split_every(data, size))) == [b"first", b"", b"third line", b"last"]
+
+def test_lines_keep_inner_blank_lines_and_unterminated_last_line():
+    assert list(iter_lines([b"a\n\n", b"\nb"])) == [b"a", b"", b"", b"b"]
+    assert list(iter_lines([b"\n\n"])) == []
+
+def test_exact_checker():
+    assert check("exact", b"1 2\n3\n", b"1 2\r\n3\n\n") == (True, "")
+    passed, message = check("exact", b"1 2\n3\n", b"1  2\n3\n")
+    assert not passed and message.startswith("Mismatch at line 1")
+
+def test_whitespace_checker():
+    assert check("whitespace", b"1 2\n3\n", b"1\n2 3") == (True, "")
+    passed, message = check("whitespace", b"1 2 3", b"1 2")
+    assert not passed and message.startswith("Output ended early at token 3")
+    passed, message = check("whitespace", b"1 2", b"1 2 3")
+    assert not passed and message.startswith("Unexpected extra output at token 3")
+
+def test_float_checker_tolerances():
+    assert check("float", b"0.333333 2", b"0.3333331 2.0000001") == (True, "")
+    assert not check("float", b"0.5", b"0.51")[0]
+    assert check("float", b"0.5", b"0.51", {"abs_tol": 0.05}) == (True, "")
+    assert check("float", b"1000", b"1001", {"rel_tol": 0.01}) == (True, "")
+
+def test_float_checker_non_numeric_tokens_must_match_exactly():
+    assert check("float", b"YES 1.0", b"YES 1") == (True, "")
+    passed, message = check("float", b"YES", b"NO")
+    assert not passed and "expected 'YES', got 'NO'" in message
+
+def test_checker_stops_at_first_mismatch():
+    read = []
+
+    def actual():
+        for chunk in (b"1 ", b"9 ", b"3 "):
+            read.append(chunk)
+            yield chunk
+
+    passed, _ = CHECKERS["whitespace"](iter([b"1 2 3 "]), actual(), {})
+    assert not passed
+    assert read == [b"1 ", b"9 "]
@@ -0,0 +1,41 @@
+import os
+import shutil
+import sqlite3
+import db_fix_presence
+from app import db
+
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'codecollab.db')
+
+def columns(path, table):
+    with sqlite3.connect(path) as connection:
+        return {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+
+def test_upgrades_the_shipped_sqlite_database(tmp_path, make_app):
+    path = str(tmp_path / 'old.db')
+    shutil.copy(SHIPPED_DB, path)
+    assert 'revision' not in columns(path, 'room')
+
+    db_fix_presence.main(f"sqlite:///{path}")
+    # Running it again is a no-op
+    db_fix_presence.main(f"sqlite:///{path}")
+
+    assert {'revision', 'last_active_at', 'hibernated'} <= columns(path, 'room')
+    assert {'checker', 'checker_options', 'updated_at'} <= columns(path, 'problem')
+    assert {'input_blob', 'output_blob'} <= columns(path, 'test_case')
+
+    app = make_app(f"sqlite:///{path}")
+    with app.app_context():
+        db.create_all()  # as run.py does, for tables added since (chunks, cold storage)
+        client = app.test_client()
+        assert client.get('/api/rooms/missing').status_code == 404
+        with sqlite3.connect(path) as connection:
+            connection.execute("INSERT INTO user (id, username, password_hash) VALUES (1, 'u', 'x')")
+            connection.execute("INSERT INTO room (id, code_content, created_by) VALUES ('r1', 'print(1)', 1)")
+        response = client.get('/api/rooms/r1')
+        assert response.status_code == 200
+        assert response.json['code_content'] == 'print(1)'
+        db.session.remove()
+
+def test_relative_sqlite_paths_resolve_to_the_instance_folder(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///codecollab.db')
+    assert db_fix_presence.get_database_uri() == f"sqlite:///{SHIPPED_DB}"
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import db, socketio
+from app import presence_reaper
+from app.api_routes import active_users, socket_sessions, upsert_presence
+from app.models import Room, UserPresence
+from app.presence_reaper import forget_reaped_users, reap_stale_presence
+
+def age(username, hours=1):
+    presence = UserPresence.query.filter_by(username=username).one()
+    presence.last_seen = datetime.now(timezone.utc) - timedelta(hours=hours)
+    db.session.commit()
+
+@pytest.fixture
+def room(app):
+    db.session.add(Room(id='r1', created_by=None))
+    db.session.commit()
+    return 'r1'
+
+def test_reaps_only_stale_rows(app, room):
+    for username in ('ann', 'bob'):
+        upsert_presence(room, username, {})
+    age('ann')
+    assert reap_stale_presence(60, batch_size=1) == {room: {'ann'}}
+    assert [p.username for p in UserPresence.query.all()] == ['bob']
+    assert presence_reaper.reaper_metrics['last_reaped'] == 1
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_heartbeat_between_select_and_delete_keeps_the_row(app, room, monkeypatch, returning):
+    for username in ('ann', 'bob'):
+        upsert_presence(room, username, {})
+        age(username)
+    delete_stale = presence_reaper._delete_stale
+
+    def heartbeat_first(rows, cutoff):
+        # bob's heartbeat lands after the reaper selected him
+        upsert_presence(room, 'bob', {}, commit=False)
+        db.session.flush()
+        return delete_stale(rows, cutoff)
+
+    monkeypatch.setattr(presence_reaper, '_delete_stale', heartbeat_first)
+    dialect = db.session.get_bind(UserPresence.__mapper__).dialect
+    monkeypatch.setattr(dialect, 'delete_returning', returning)
+    assert reap_stale_presence(60) == {room: {'ann'}}
+    assert [p.username for p in UserPresence.query.all()] == ['bob']
+
+def test_forget_reaped_users_announces_and_prunes(app, room):
+    ann, bob = socketio.test_client(app), socketio.test_client(app)
+    ann.emit('join_room', {'room_id': room, 'username': 'ann'})
+    bob.emit('join_room', {'room_id': room, 'username': 'bob'})
+    bob.get_received()
+    forget_reaped_users(room, {'ann'})
+    assert [user['username'] for user in active_users[room]] == ['bob']
+    assert [session['username'] for session in socket_sessions.values()] == ['bob']
+    left = [m['args'][0] for m in bob.get_received() if m['name'] == 'user_left']
+    assert left == [{'username': 'ann'}]
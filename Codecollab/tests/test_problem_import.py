@@ -0,0 +1,98 @@
+import io
+import json
+import os
+import tarfile
+import pytest
+from flask_jwt_extended import create_access_token
+from app import db
+from app.blob_store import blob_path
+from app.models import Problem, TestCase, User
+from app.problem_import import PackageError, import_package
+
+BIG = "x" * 100
+
+def package(files):
+    """Builds a gzipped problem package in memory from {member name: text}."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz') as archive:
+        for name, text in files.items():
+            data = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+def problem(title, tests):
+    files = {f'{title}/problem.json': json.dumps({"title": title, "description": "D"})}
+    for name, (input_text, output_text) in tests.items():
+        files[f'{title}/tests/{name}.in'] = input_text
+        files[f'{title}/tests/{name}.out'] = output_text
+    return files
+
+def stored_blobs(app):
+    root = app.config['BLOB_STORE_DIR']
+    return sorted(name for _, _, names in os.walk(root) for name in names)
+
+@pytest.fixture
+def app(make_app):
+    # Anything over 10 bytes goes to the blob store
+    app = make_app(TESTCASE_INLINE_LIMIT=10)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_large_tests_are_stored_once(app):
+    stats = import_package(package(problem('p', {'01': ('1', '1'), '02': (BIG, BIG), '03': (BIG, '3')})))
+    assert stats['test_cases'] == 3
+    assert (stats['blobs_written'], stats['blobs_reused']) == (1, 2)
+    digest = TestCase.query.filter(TestCase.input_blob.isnot(None)).first().input_blob
+    assert stored_blobs(app) == [digest]
+    assert os.path.exists(blob_path(digest))
+
+def test_failed_import_removes_only_the_blobs_it_wrote(app):
+    import_package(package(problem('p', {'01': (BIG, '1')})))
+    kept = stored_blobs(app)
+    files = problem('q', {'01': (BIG, '1'), '02': ("y" * 100, '2')})
+    del files['q/tests/02.out']
+    with pytest.raises(PackageError, match="needs both .in and .out"):
+        import_package(package(files))
+    # The new blob is gone; the one still used by problem p is not
+    assert stored_blobs(app) == kept
+    assert Problem.query.count() == 1
+
+def test_replacing_a_suite_removes_its_old_blobs(app):
+    import_package(package(problem('p', {'01': (BIG, '1')})))
+    old = stored_blobs(app)
+    stats = import_package(package(problem('p', {'01': ("y" * 100, '1')})))
+    assert stats['problems_replaced'] == 1 and stats['blobs_removed'] == 1
+    assert stored_blobs(app) != old and len(stored_blobs(app)) == 1
+
+@pytest.mark.parametrize('name', ['../p/problem.json', 'p/../../etc/problem.json', 'p/tests/../../../x.in'])
+def test_unsafe_member_paths_are_rejected(app, name):
+    files = problem('p', {'01': (BIG, '1')})
+    files[name] = '{}'
+    with pytest.raises(PackageError, match="Unsafe path"):
+        import_package(package(files))
+    assert Problem.query.count() == 0
+    assert stored_blobs(app) == []
+
+def test_import_route_requires_an_admin(app, client):
+    for username in ('admin', 'bob'):
+        user = User(username=username)
+        user.set_password('secret')
+        db.session.add(user)
+    db.session.commit()
+    body = package(problem('p', {'01': ('1', '1')})).read()
+
+    assert client.post('/api/problems/import', data=body).status_code == 401
+    bob = {'Authorization': 'Bearer ' + create_access_token(identity='2')}
+    response = client.post('/api/problems/import', data=body, headers=bob)
+    assert response.status_code == 403
+    assert Problem.query.count() == 0
+    admin = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+    response = client.post('/api/problems/import', data=body, headers=admin)
+    assert response.status_code == 201
+    assert response.json['problems_created'] == 1
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import db, socketio
+from app.documents import document_text, set_document_text
+from app.models import DocumentChunk, Room, RoomColdStorage, UserPresence
+from app.room_lifecycle import _claim_for_hibernation, hibernate_idle_rooms
+
+TEXT = "print('hello')\n" * 200
+
+def add_room(room_id, minutes_idle, text=TEXT):
+    room = Room(id=room_id, created_by=None)
+    db.session.add(room)
+    db.session.flush()
+    set_document_text(room, text)
+    room.last_active_at = datetime.now(timezone.utc) - timedelta(minutes=minutes_idle)
+    db.session.commit()
+    return room
+
+def hibernated_ids():
+    db.session.expire_all()
+    return sorted(room.id for room in Room.query.filter_by(hibernated=True))
+
+@pytest.fixture
+def app(make_app):
+    # A small threshold so the test documents are stored as chunks
+    app = make_app(DOCUMENT_CHUNK_THRESHOLD=1000)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def cold_room(app):
+    add_room('r1', minutes_idle=120)
+    assert hibernate_idle_rooms(3600) == (1, 0)
+    return 'r1'
+
+def test_idle_room_moves_to_cold_storage(app, cold_room):
+    room = db.session.get(Room, cold_room)
+    assert room.hibernated and room.code_content is None
+    assert DocumentChunk.query.filter_by(room_id=cold_room).count() == 0
+    assert RoomColdStorage.query.filter_by(room_id=cold_room).count() == 1
+    # Reads are served from cold storage without rehydrating
+    assert document_text(room) == TEXT
+    assert room.hibernated
+
+def test_join_rehydrates_without_bumping_revision(app, cold_room):
+    revision = db.session.get(Room, cold_room).revision
+    client = socketio.test_client(app)
+    client.emit('join_room', {'room_id': cold_room, 'username': 'ann'})
+    db.session.expire_all()
+    room = db.session.get(Room, cold_room)
+    assert not room.hibernated
+    assert room.revision == revision
+    assert document_text(room) == TEXT
+    assert RoomColdStorage.query.filter_by(room_id=cold_room).count() == 0
+
+def test_edit_rehydrates_and_bumps_revision(app, cold_room):
+    revision = db.session.get(Room, cold_room).revision
+    client = socketio.test_client(app)
+    client.emit('code_change', {'room_id': cold_room, 'code_content': TEXT + "print('bye')\n"})
+    db.session.expire_all()
+    room = db.session.get(Room, cold_room)
+    assert not room.hibernated
+    assert room.revision == revision + 1
+    assert document_text(room) == TEXT + "print('bye')\n"
+    assert RoomColdStorage.query.filter_by(room_id=cold_room).count() == 0
+
+def test_occupied_room_is_not_claimed(app):
+    room = add_room('r1', minutes_idle=120)
+    db.session.add(UserPresence(room_id='r1', username='ann', user_color='#fff'))
+    db.session.commit()
+    assert not _claim_for_hibernation(room)
+    assert hibernate_idle_rooms(3600) == (0, 0)
+    assert hibernated_ids() == []
+
+def test_room_edited_after_selection_is_not_claimed(app):
+    room = add_room('r1', minutes_idle=120)
+    selected_revision = room.revision
+    # Another worker saves the room after the hibernator read its revision
+    db.session.query(Room).filter_by(id='r1').update(
+        {Room.revision: Room.revision + 1}, synchronize_session=False)
+    assert room.revision == selected_revision
+    assert not _claim_for_hibernation(room)
+    db.session.rollback()
+    assert hibernated_ids() == []
+
+def test_hot_limit_hibernates_least_recently_active(app):
+    for index, minutes_idle in enumerate([5, 40, 10, 30, 20]):
+        add_room(f'r{index}', minutes_idle=minutes_idle)
+    db.session.add(UserPresence(room_id='r1', username='ann', user_color='#fff'))
+    db.session.commit()
+    # Nothing is idle, so only the LRU pass runs; the occupied r1 is passed over
+    assert hibernate_idle_rooms(3600, hot_limit=2, batch_size=2) == (0, 3)
+    assert hibernated_ids() == ['r2', 'r3', 'r4']
+    assert Room.query.filter_by(hibernated=False).count() == 2
@@ -0,0 +1,83 @@
+import random
+import pytest
+from app import rope
+from app.rope import Rope
+
+@pytest.fixture
+def small_leaves(monkeypatch):
+    # Tiny leaves so short texts span many treap nodes
+    monkeypatch.setattr(rope, 'MAX_LEAF', 16)
+
+def position(text, offset):
+    line = text.count('\n', 0, offset) + 1
+    return line, offset - (text.rfind('\n', 0, offset) + 1) + 1
+
+def test_empty_rope():
+    doc = Rope()
+    assert len(doc) == 0
+    assert doc.text() == ""
+    assert doc.line_count == 1
+    assert doc.position_to_offset(1, 1) == 0
+
+def test_chunks_prefer_line_boundaries(small_leaves):
+    doc = Rope("abcdefghij\n" * 10)
+    leaves = [leaf.text for leaf in doc.leaves()]
+    assert "".join(leaves) == "abcdefghij\n" * 10
+    assert all(len(leaf) <= 16 for leaf in leaves)
+    assert all(leaf.endswith('\n') for leaf in leaves)
+
+def test_random_edits_match_plain_string(small_leaves):
+    rng = random.Random(3)
+    expected = "".join(rng.choice("ab\nc") for _ in range(500))
+    doc = Rope(expected)
+    for _ in range(2000):
+        op = rng.random()
+        if op < 0.4:
+            offset = rng.randint(0, len(expected))
+            text = "".join(rng.choice("xy\n") for _ in range(rng.randint(1, 20)))
+            expected = expected[:offset] + text + expected[offset:]
+            doc.insert(offset, text)
+        elif op < 0.7:
+            start = rng.randint(0, len(expected))
+            end = rng.randint(start, min(len(expected), start + 30))
+            expected = expected[:start] + expected[end:]
+            doc.delete(start, end)
+        else:
+            start = rng.randint(0, len(expected))
+            end = rng.randint(start, len(expected))
+            expected = expected[:start] + "Z" + expected[end:]
+            doc.replace(start, end, "Z")
+        assert len(doc) == len(expected)
+        start = rng.randint(0, len(expected))
+        end = rng.randint(start, len(expected))
+        assert doc.slice(start, end) == expected[start:end]
+    assert doc.text() == expected
+    assert doc.line_count == expected.count('\n') + 1
+
+def test_offset_position_round_trip(small_leaves):
+    text = "first line\n\nthird\nfourth line is longer\n"
+    doc = Rope(text)
+    for offset in range(len(text) + 1):
+        assert doc.offset_to_position(offset) == position(text, offset)
+        assert doc.position_to_offset(*position(text, offset)) == offset
+
+def test_position_is_clamped_to_document():
+    doc = Rope("ab\ncd")
+    assert doc.position_to_offset(0, 1) == 0
+    assert doc.position_to_offset(1, 99) == 2
+    assert doc.position_to_offset(99, 1) == 3
+    assert doc.position_to_offset(2, -5) == 3
+
+def test_set_text_keeps_unchanged_leaves(small_leaves):
+    text = "".join(f"line {i:03}\n" for i in range(50))
+    doc = Rope(text)
+    before = [leaf.checksum for leaf in doc.leaves()]
+    doc.set_text(text.replace("line 025", "LINE 025"))
+    after = [leaf.checksum for leaf in doc.leaves()]
+    assert doc.text() == text.replace("line 025", "LINE 025")
+    assert len(set(before) - set(after)) <= 2
+
+def test_from_chunks_keeps_boundaries():
+    doc = Rope.from_chunks(["abc\n", "", "def"])
+    assert [leaf.text for leaf in doc.leaves()] == ["abc\n", "def"]
+    assert doc.line_count == 2
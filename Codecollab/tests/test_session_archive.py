@@ -0,0 +1,99 @@
+import gzip
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import db
+from app.models import Room, SessionEvent
+from app.session_archive import (SUMMARY_EVENT_TYPE, archive_path, archive_room, compact_room,
+                                 load_session_events, read_archived_events)
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def add_events(room_id, *types):
+    """Adds events one minute apart, starting at START. Returns the rows."""
+    events = []
+    for minute, event_type in enumerate(types):
+        event = SessionEvent(room_id=room_id, event_type=event_type,
+                             payload={"length": minute, "message_id": f"m{minute}"},
+                             created_at=START + timedelta(minutes=minute))
+        db.session.add(event)
+        events.append(event)
+    db.session.commit()
+    return events
+
+@pytest.fixture
+def room(app):
+    db.session.add(Room(id='r1', created_by=None))
+    db.session.commit()
+    return 'r1'
+
+def test_compact_collapses_runs_into_summaries(app, room):
+    add_events(room, "join", "code_change", "code_change", "code_change", "submit", "code_change", "code_change", "code_change")
+    # The last code_change is newer than the cutoff and stays as it is
+    cutoff = START + timedelta(minutes=7)
+    assert compact_room(room, cutoff, dry_run=True) == 3
+    assert SessionEvent.query.count() == 8
+
+    assert compact_room(room, cutoff) == 3
+    timeline = [e['event_type'] for e in load_session_events(room)]
+    assert timeline == ["join", SUMMARY_EVENT_TYPE, "submit", SUMMARY_EVENT_TYPE, "code_change"]
+    summaries = [e['payload'] for e in load_session_events(room) if e['event_type'] == SUMMARY_EVENT_TYPE]
+    assert [s['collapsed'] for s in summaries] == [3, 2]
+    assert summaries[0]['final_length'] == 3 and summaries[0]['last_message_id'] == 'm3'
+    # Compacting again finds nothing left to collapse
+    assert compact_room(room, cutoff) == 0
+
+def test_summary_counts_and_start_survive_compaction(client, room):
+    add_events(room, "code_change", "code_change", "code_change", "join")
+    before = client.get(f'/api/sessions/{room}/summary').json
+    compact_room(room, START + timedelta(days=1))
+    after = client.get(f'/api/sessions/{room}/summary').json
+    assert after['event_counts'] == before['event_counts'] == {"code_change": 3, "join": 1}
+    assert after['total_events'] == 4
+    # The summary row is stamped with the run's last event; the session still starts at the first
+    assert after['session_start'] == before['session_start']
+    assert after['session_start'].startswith("2026-01-01T00:00:00")
+
+def test_archive_round_trips_the_timeline(app, room):
+    add_events(room, "join", "code_change", "submit")
+    compact_room(room, START + timedelta(days=1))
+    before = load_session_events(room)
+    assert archive_room(room) == 3
+    assert SessionEvent.query.count() == 0
+    assert load_session_events(room) == before
+    # New live events are appended after the archived ones
+    add_events(room, "leave")
+    assert [e['event_type'] for e in load_session_events(room)] == ["join", "code_change", "submit", "leave"]
+
+def test_retried_archive_run_is_deduplicated(app, room, monkeypatch):
+    add_events(room, "join", "code_change")
+    commit = db.session.commit
+
+    def failing_commit():
+        raise RuntimeError("connection lost")
+
+    # The archive is written, but deleting the rows fails, so the next run archives them again
+    monkeypatch.setattr(db.session, 'commit', failing_commit)
+    with pytest.raises(RuntimeError):
+        archive_room(room)
+    monkeypatch.setattr(db.session, 'commit', commit)
+    db.session.rollback()
+    assert SessionEvent.query.count() == 2
+    assert archive_room(room) == 2
+
+    with gzip.open(archive_path(room), 'rt', encoding='utf-8') as f:
+        assert len(f.readlines()) == 4
+    assert [e['event_type'] for e in read_archived_events(room)] == ["join", "code_change"]
+
+def test_reused_ids_are_not_merged(app, room):
+    first_id = add_events(room, "join")[0].id
+    archive_room(room)
+    # SQLite may hand the purged row's id to the next event
+    event = SessionEvent(id=first_id, room_id=room, event_type="leave", payload={},
+                         created_at=START + timedelta(hours=1))
+    db.session.add(event)
+    db.session.commit()
+    archive_room(room)
+    assert [e['event_type'] for e in read_archived_events(room)] == ["join", "leave"]
+
+def test_missing_archive_reads_as_empty(app):
+    assert read_archived_events('nothing') == []
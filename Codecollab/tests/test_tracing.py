@@ -0,0 +1,48 @@
+import logging
+import pytest
+from app import db, socketio, tracing
+from app.models import Room
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(record.getMessage())
+
+@pytest.fixture
+def traced(app, monkeypatch):
+    monkeypatch.setattr(tracing, 'enabled', True)
+    monkeypatch.setattr(tracing, 'sample_rates', {'cursor_move': 0})
+    monkeypatch.setattr(tracing, 'default_sample_rate', 1.0)
+    handler = ListHandler()
+    previous = tracing.logger.level
+    tracing.logger.setLevel(logging.DEBUG)
+    tracing.logger.addHandler(handler)
+    yield handler.lines
+    tracing.logger.removeHandler(handler)
+    tracing.logger.setLevel(previous)
+
+def test_current_span_is_null_outside_handlers():
+    assert tracing.current_span() is tracing.NULL_SPAN
+    assert tracing.event_span('typing', {'room_id': 'r1'}) is tracing.NULL_SPAN
+
+def test_every_tracked_handler_gets_a_span(app, traced):
+    db.session.add(Room(id='r1', created_by=None))
+    db.session.commit()
+    client = socketio.test_client(app)
+    client.emit('join_room', {'room_id': 'r1', 'username': 'ann'})
+    client.emit('typing', {'room_id': 'r1', 'username': 'ann', 'is_typing': True})
+    client.emit('cursor_move', {'room_id': 'r1', 'username': 'ann', 'line': 1, 'column': 1})
+    client.emit('code_change', {'room_id': 'r1', 'code_content': 'x = 1', 'message_id': 'm1'})
+    client.disconnect()
+
+    done = [line for line in traced if line.endswith('msg=done')]
+    events = [line.split()[0] for line in done]
+    assert events == ['event=join_room', 'event=typing', 'event=code_change', 'event=disconnect']
+    assert all('room=r1' in line for line in done)
+    assert 'user=ann' in done[1] and 'user=ann' in done[3]
+    # Fields a handler adds with annotate() end up on the span's closing line
+    assert 'message_id=m1' in done[2] and 'length=5' in done[2]
+    assert tracing.current_span() is tracing.NULL_SPAN
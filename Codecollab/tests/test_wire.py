@@ -0,0 +1,44 @@
+import json
+import zlib
+import pytest
+from app import metrics, socketio, wire
+
+class RecordingServer:
+    def __init__(self):
+        self.sent = []
+
+    def emit(self, event, data=None, **kwargs):
+        self.sent.append((event, data))
+
+@pytest.fixture
+def server(app, monkeypatch):
+    server = RecordingServer()
+    metrics._wrap_server_emit(server)
+    monkeypatch.setattr(socketio, 'server', server)
+    monkeypatch.setattr(metrics, 'broadcast_bytes', metrics.Counter('test_bytes', ''))
+    return server
+
+def test_negotiate_only_offers_json(app, monkeypatch):
+    monkeypatch.setattr(wire, 'client_formats', {})
+    assert wire.negotiate('s1', {'encodings': ['msgpack'], 'compression': ['deflate']}) is None
+    assert wire.negotiate('s2', {'encodings': ['msgpack', 'json'], 'compression': ['deflate']}) == 'json+deflate'
+    assert wire.client_formats == {'s2': 'json+deflate'}
+
+def test_packed_frames_are_counted_at_their_encoded_size(server, monkeypatch):
+    monkeypatch.setattr(wire, 'client_formats', {'s1': 'json+deflate'})
+    payload = {'code_content': "print('hello')\n" * 1000, 'message_id': 'm1'}
+    wire.send('code_update', payload, 's1')
+    [(event, envelope)] = server.sent
+    assert json.loads(zlib.decompress(envelope['data'])) == payload
+    assert metrics.broadcast_bytes.values == {(('event', 'code_update'),): len(envelope['data'])}
+
+def test_unencoded_payloads_are_sized_by_sampling(app, monkeypatch):
+    server = RecordingServer()
+    monkeypatch.setattr(metrics, 'broadcast_bytes', metrics.Counter('test_bytes', ''))
+    metrics._wrap_server_emit(server, sample_every=3)
+    payload = {'username': 'ann'}
+    for _ in range(6):
+        server.emit('user_joined', payload)
+    assert len(server.sent) == 6
+    size = len(json.dumps(payload, separators=(',', ':')))
+    assert metrics.broadcast_bytes.values == {(('event', 'user_joined'),): 2 * 3 * size}
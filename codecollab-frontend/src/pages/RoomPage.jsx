@@ -5,6 +5,7 @@ import Editor from '@monaco-editor/react';
 import Layout from '../components/Layout';
 import { getUsername, getToken } from '../utils/auth';
 import { buildApiUrl } from '../utils/apiConfig';
+import { WIRE_CAPABILITIES, createUnpacker } from '../utils/wireFormat';
 
 // Debounce utility
 function debounce(func, wait) {
@@ -296,6 +297,7 @@ const RoomPage = () => {
     setIsCheckingAuth(false);
     const socket = io(import.meta.env.VITE_API_BASE_URL || '');
     socketRef.current = socket;
+    const unpack = createUnpacker();
 
     // --- All Socket Event Listeners are defined here ---
     socket.on('connect', () => {
@@ -312,41 +314,10 @@ const RoomPage = () => {
         // Don't add current user immediately - wait for existing_users response
         // This prevents duplicates and ensures we get the complete list
         
-        // Join room with authenticated user
+        // Join room with authenticated user; the server answers with a single room_bootstrap
+        // payload (document, problem, problem list and users) instead of separate requests
         console.log('Joining room:', roomId, 'with username:', username); // Debug log
-        socket.emit('join_room', { room_id: roomId, username, authenticated: true });
-        
-        // Request existing users in the room
-        console.log('Requesting existing users for room:', roomId); // Debug log
-        socket.emit('request_existing_users', { room_id: roomId });
-        
-        // Fetch the initial state of the room
-        fetch(buildApiUrl(`api/rooms/${roomId}`))
-          .then(res => res.json())
-          .then(data => {
-            console.log('Room data received:', data);
-            if (data.problem && data.problem.title) {
-              setProblem(data.problem);
-              setLanguage(data.language || 'python');
-              setView('coding');
-              setCode(data.problem.template_code || '');
-              // Always fetch problems if not loaded
-              if (!problems.length) {
-                fetch(buildApiUrl(`api/problems`))
-                  .then(res => res.json())
-                  .then(setProblems);
-              }
-            } else {
-              setView('lobby');
-              // Fetch problems for lobby
-              fetch(buildApiUrl(`api/problems`))
-                .then(res => res.json())
-                .then(setProblems);
-            }
-          })
-          .catch(error => {
-            console.error('Error fetching room data:', error);
-          });
+        socket.emit('join_room', { room_id: roomId, username, authenticated: true, wire: WIRE_CAPABILITIES, bootstrap: true });
       } else {
         // This shouldn't happen due to ProtectedRoute, but just in case
         setStatus('Authentication required');
@@ -354,17 +325,32 @@ const RoomPage = () => {
       }
     });
 
+    socket.on('room_bootstrap', unpack((data) => {
+      console.log('Room bootstrap received:', data);
+      setProblems(data.problems || []);
+      setUsers(data.users || []);
+      setIsLoadingUsers(false);
+      if (data.problem && data.problem.title) {
+        setProblem(data.problem);
+        setLanguage(data.language || 'python');
+        setView('coding');
+        setCode(data.code_content ?? data.problem.template_code ?? '');
+      } else {
+        setView('lobby');
+      }
+    }));
+
     // Test event listeners
     socket.on('connected', (data) => {
       console.log('🎉 Received connected event:', data);
     });
 
-    socket.on('problem_loaded', (data) => {
+    socket.on('problem_loaded', unpack((data) => {
       setProblem(data.problem);
       setLanguage(data.language || 'python');
       setView('coding');
       setCode(data.problem.template_code || '');
-    });
+    }));
 
     socket.on('lobby_activated', (data) => {
       setView('lobby');
@@ -374,7 +360,7 @@ const RoomPage = () => {
         .then(setProblems);
     });
 
-         socket.on('code_update', (data) => {
+         socket.on('code_update', unpack((data) => {
        // Always update from socket to ensure perfect sync
        console.log('🎉 RECEIVED code_update event!');
        console.log('Received code_update:', data);
@@ -416,7 +402,7 @@ const RoomPage = () => {
        console.log('Calling updateEditorContent...');
        updateEditorContent(data.code_content);
        console.log('updateEditorContent called');
-     });
+     }));
 
     // Test if we can receive any events
     socket.on('connect_error', (error) => {
@@ -487,8 +473,16 @@ const RoomPage = () => {
       }));
     });
 
+    // Keep our presence row alive; the server reaps rows without a recent heartbeat
+    const heartbeatInterval = setInterval(() => {
+      if (socket.connected) {
+        socket.emit('presence_heartbeat', { room_id: roomId, username: getUsername() || 'User' });
+      }
+    }, 30000);
+
     // Cleanup function to disconnect the socket when the component is unmounted
     return () => {
+      clearInterval(heartbeatInterval);
       if (typingTimeoutRef.current) {
         clearTimeout(typingTimeoutRef.current);
         typingTimeoutRef.current = null;
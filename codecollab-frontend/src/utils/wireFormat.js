@@ -0,0 +1,37 @@
+// Negotiated wire format for large socket payloads (code_update, problem_loaded, presence_snapshot).
+// The server only sends packed frames to clients that advertise support in join_room.
+
+const canInflate = typeof DecompressionStream !== 'undefined';
+
+// Capabilities sent with join_room; older browsers fall back to plain JSON events
+export const WIRE_CAPABILITIES = canInflate
+  ? { encodings: ['json'], compression: ['deflate'] }
+  : null;
+
+const isPacked = (data) =>
+  data && typeof data === 'object' && 'encoding' in data && 'data' in data;
+
+const inflate = async (bytes) => {
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+};
+
+const decode = async (data) => {
+  let bytes = data.data instanceof ArrayBuffer ? new Uint8Array(data.data) : data.data;
+  if (data.compression === 'deflate') {
+    bytes = await inflate(bytes);
+  }
+  return JSON.parse(new TextDecoder().decode(bytes));
+};
+
+// Wraps socket handlers so packed and plain payloads reach them as the same object.
+// Decoding is chained so updates are applied in the order they arrived.
+export const createUnpacker = () => {
+  let chain = Promise.resolve();
+  return (handler) => (data) => {
+    chain = chain
+      .then(() => (isPacked(data) ? decode(data) : data))
+      .then(handler)
+      .catch((error) => console.error('Failed to handle socket payload', error));
+  };
+};